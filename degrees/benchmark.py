@@ -0,0 +1,436 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+
+import degrees
+from graph import fingerprint
+from util import Node, QueueFrontier, SearchStats, StackFrontier
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for degrees.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="compare BFS with bidirectional search")
+    search.add_argument("--directory", default="small",
+                        help="dataset to benchmark on (default: small)")
+    search.add_argument("--people", type=int, default=5000,
+                        help="size of the synthetic dataset (default: 5000)")
+    search.add_argument("--queries", type=int, default=20)
+    search.add_argument("--seed", type=int, default=0)
+
+    frontier = commands.add_parser("frontier", help="time frontier operations by size")
+    frontier.add_argument("--sizes", type=int, nargs="+", default=[10 ** 5, 10 ** 6])
+    frontier.add_argument("--ops", type=int, default=100,
+                          help="operations timed at each size (default: 100)")
+
+    load = commands.add_parser("load", help="time loading from CSV and from the cache")
+    load.add_argument("--directory", default="small",
+                      help="dataset to benchmark on (default: small)")
+    load.add_argument("--people", type=int, default=100000,
+                      help="size of the synthetic dataset (default: 100000)")
+    load.add_argument("--seed", type=int, default=0)
+
+    ingest = commands.add_parser("ingest", help="compare CSV loaders for time and peak RSS")
+    ingest.add_argument("--stars", type=int, default=10 ** 7,
+                        help="rows in the synthetic stars.csv (default: 10000000)")
+    ingest.add_argument("--seed", type=int, default=0)
+
+    lookup = commands.add_parser("names", help="time prefix and fuzzy name lookups")
+    lookup.add_argument("--people", type=int, default=100000,
+                        help="size of the synthetic dataset (default: 100000)")
+    lookup.add_argument("--queries", type=int, default=200)
+    lookup.add_argument("--seed", type=int, default=0)
+
+    oracle = commands.add_parser("oracle", help="time skewed queries with the cache and landmarks")
+    oracle.add_argument("--people", type=int, default=20000,
+                        help="size of the synthetic dataset (default: 20000)")
+    oracle.add_argument("--queries", type=int, default=2000)
+    oracle.add_argument("--cache", type=int, default=1000)
+    oracle.add_argument("--landmarks", type=int, default=16)
+    oracle.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "oracle":
+        with tempfile.TemporaryDirectory() as directory:
+            generate_dataset(directory, args.people, seed=args.seed)
+            bench_oracle(directory, args.queries, args.cache, args.landmarks, args.seed)
+    elif args.command == "names":
+        with tempfile.TemporaryDirectory() as directory:
+            generate_dataset(directory, args.people, seed=args.seed)
+            bench_names(directory, args.queries, args.seed)
+    elif args.command == "ingest":
+        with tempfile.TemporaryDirectory() as directory:
+            generate_dataset(directory, args.stars // 5, args.stars // 4, args.stars, seed=args.seed)
+            bench_ingest(directory)
+    elif args.command == "load":
+        bench_load(args.directory)
+        with tempfile.TemporaryDirectory() as directory:
+            generate_dataset(directory, args.people, seed=args.seed)
+            bench_load(directory)
+    elif args.command == "frontier":
+        bench_frontier(args.sizes, args.ops)
+    elif args.command == "search":
+        bench_search(args.directory, args.queries, args.seed)
+        with tempfile.TemporaryDirectory() as directory:
+            generate_dataset(directory, args.people, seed=args.seed)
+            bench_search(directory, args.queries, args.seed)
+
+
+def generate_dataset(directory, n_people, n_movies=None, n_stars=None, seed=0):
+    """
+    Write a synthetic people.csv, movies.csv and stars.csv to `directory`,
+    with `n_movies` defaulting to half of `n_people` and `n_stars` to four
+    stars per movie.
+
+    Casting is skewed so that a few people star in many movies, which
+    gives the graph the same hub-heavy shape as the IMDb data.
+    """
+    rng = random.Random(seed)
+    if n_movies is None:
+        n_movies = max(1, n_people // 2)
+    if n_stars is None:
+        n_stars = 4 * n_movies
+
+    with open(os.path.join(directory, "people.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(n_people):
+            writer.writerow([i, fake_name(rng), 1900 + i % 100])
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(n_movies):
+            writer.writerow([i, f"Movie {i}", 1900 + i % 120])
+
+    with open(os.path.join(directory, "stars.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for i in range(n_stars):
+            writer.writerow([int(n_people * rng.random() ** 2), i * n_movies // n_stars])
+
+
+class ListStackFrontier():
+    """
+    The original list-backed frontier, kept as a baseline: removing
+    copies the list and `contains_state` scans every node.
+    """
+    def __init__(self):
+        self.frontier = []
+
+    def add(self, node):
+        self.frontier.append(node)
+
+    def contains_state(self, state):
+        return any(node.state == state for node in self.frontier)
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[-1]
+            self.frontier = self.frontier[:-1]
+            return node
+
+
+class ListQueueFrontier(ListStackFrontier):
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[0]
+            self.frontier = self.frontier[1:]
+            return node
+
+
+def bench_frontier(sizes, n_ops):
+    """
+    Fill each kind of frontier with `size` nodes, then time `n_ops`
+    membership checks and removals, reporting microseconds per operation.
+    """
+    frontiers = [
+        ("list stack", ListStackFrontier),
+        ("list queue", ListQueueFrontier),
+        ("stack", StackFrontier),
+        ("queue", QueueFrontier),
+    ]
+    print(f"{'frontier':>10} {'size':>9} {'add':>9} {'contains':>9} {'remove':>9}  (us/op)")
+    for size in sizes:
+        for name, Frontier in frontiers:
+            frontier = Frontier()
+
+            start = time.perf_counter()
+            for i in range(size):
+                frontier.add(Node(state=i, parent=None, action=None))
+            add = (time.perf_counter() - start) / size
+
+            # Look for a state that is not there, the worst case for a scan
+            start = time.perf_counter()
+            for _ in range(n_ops):
+                frontier.contains_state(-1)
+            contains = (time.perf_counter() - start) / n_ops
+
+            start = time.perf_counter()
+            for _ in range(n_ops):
+                frontier.remove()
+            remove = (time.perf_counter() - start) / n_ops
+
+            print(f"{name:>10} {size:>9} {add * 1e6:>9.3f} "
+                  f"{contains * 1e6:>9.3f} {remove * 1e6:>9.3f}")
+
+
+# Syllables for synthetic names, so that name lookups see realistic spellings
+SYLLABLES = [
+    consonant + vowel + coda
+    for consonant in ["", "b", "d", "f", "g", "h", "j", "k", "l", "m", "n",
+                      "p", "r", "s", "t", "v", "w", "ch", "sh", "th"]
+    for vowel in ["a", "e", "i", "o", "u", "ea", "ou"]
+    for coda in ["", "n", "r", "s"]
+]
+
+
+def fake_name(rng):
+    """
+    Return a random two-part name built from SYLLABLES.
+    """
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))).capitalize()
+        for _ in range(2)
+    )
+
+
+def misspell(name, rng):
+    """
+    Return `name` with one random character deleted, replaced or inserted.
+    """
+    i = rng.randrange(len(name))
+    edit = rng.choice(("delete", "replace", "insert"))
+    if edit == "delete":
+        return name[:i] + name[i + 1:]
+    letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    if edit == "replace":
+        return name[:i] + letter + name[i + 1:]
+    return name[:i] + letter + name[i:]
+
+
+def reset():
+    """
+    Forget any data loaded by an earlier call to degrees.load_data.
+    """
+    degrees.graph.clear()
+
+
+def legacy_load_data(directory):
+    """
+    The original loader, kept as a baseline: a dict per row from
+    csv.DictReader, and dicts of dicts holding sets of ids.
+    """
+    names = {}
+    people = {}
+    movies = {}
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            people[row["id"]] = {
+                "name": row["name"],
+                "birth": row["birth"],
+                "movies": set()
+            }
+            if row["name"].lower() not in names:
+                names[row["name"].lower()] = {row["id"]}
+            else:
+                names[row["name"].lower()].add(row["id"])
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            movies[row["id"]] = {
+                "title": row["title"],
+                "year": row["year"],
+                "stars": set()
+            }
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                people[row["person_id"]]["movies"].add(row["movie_id"])
+                movies[row["movie_id"]]["stars"].add(row["person_id"])
+            except KeyError:
+                pass
+    return names, people, movies
+
+
+def measure(loader, directory, results):
+    """
+    Run `loader` on `directory` in this (fresh) process, and put its
+    wall time and peak resident set size in MiB on `results`.
+    """
+    start = time.perf_counter()
+    loader(directory)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((elapsed, peak))
+
+
+def bench_ingest(directory):
+    """
+    Load `directory` with the original loader and with Graph.load_csv,
+    each in a fresh process, reporting wall time and peak RSS.
+    """
+    with open(os.path.join(directory, "stars.csv"), encoding="utf-8") as f:
+        rows = sum(1 for _ in f) - 1
+    print(f"{directory}: {rows} stars")
+
+    context = multiprocessing.get_context("spawn")
+    loaders = [
+        ("original", legacy_load_data),
+        ("streaming", degrees.graph.load_csv),
+    ]
+    for name, loader in loaders:
+        results = context.Queue()
+        process = context.Process(target=measure, args=(loader, directory, results))
+        process.start()
+        elapsed, peak = results.get()
+        process.join()
+        print(f"  {name:>13}: {elapsed:8.3f}s, {peak:8.1f} MiB peak RSS")
+
+
+def bench_oracle(directory, n_queries, cache_size, k, seed=0):
+    """
+    Answer queries drawn mostly from a few hundred popular people, with
+    and without the path cache and landmarks, reporting their counters.
+    """
+    reset()
+    degrees.load_data(directory)
+    rng = random.Random(seed)
+    person_ids = degrees.graph.person_ids
+    popular = [person_ids[rng.randrange(len(person_ids))] for _ in range(300)]
+
+    # Skew the popular people too, so a handful of them dominate
+    def pick():
+        if rng.random() < 0.9:
+            return popular[int(len(popular) * rng.random() ** 3)]
+        return person_ids[rng.randrange(len(person_ids))]
+
+    queries = [(pick(), pick()) for _ in range(n_queries)]
+    print(f"{directory}: {len(person_ids)} people, {n_queries} queries")
+
+    for name, size, landmarks in (("plain", 0, 0), ("oracles", cache_size, k)):
+        start = time.perf_counter()
+        degrees.use_oracles(size, landmarks)
+        setup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for source, target in queries:
+            degrees.shortest_path(source, target, bidirectional=True)
+        elapsed = time.perf_counter() - start
+        print(f"  {name:>13}: {elapsed:8.3f}s ({setup:.3f}s setup), "
+              f"{n_queries / elapsed:10.1f} queries/sec")
+        for oracle, stats in degrees.oracle_stats().items():
+            print(f"  {oracle:>13}: {stats}")
+    degrees.use_oracles(0, 0)
+
+
+def bench_names(directory, n_queries, seed=0):
+    """
+    Time prefix lookups and fuzzy lookups of misspelled names, reporting
+    how often the intended person was among the fuzzy candidates.
+    """
+    reset()
+    degrees.load_data(directory)
+    rng = random.Random(seed)
+    people = [rng.randrange(len(degrees.graph.person_ids)) for _ in range(n_queries)]
+    print(f"{directory}: {len(degrees.graph.person_ids)} people, {n_queries} queries")
+
+    start = time.perf_counter()
+    for person in people:
+        degrees.graph.people_with_prefix(degrees.graph.person_names[person][:4])
+    elapsed = time.perf_counter() - start
+    print(f"  {'prefix':>13}: {elapsed / n_queries * 1000:8.3f} ms/query")
+
+    found = 0
+    start = time.perf_counter()
+    for person in people:
+        name = misspell(degrees.graph.person_names[person], rng)
+        candidates = degrees.candidates_for_name(name)
+        found += any(c["person_id"] == degrees.graph.person_ids[person] for c in candidates)
+    elapsed = time.perf_counter() - start
+    print(f"  {'fuzzy':>13}: {elapsed / n_queries * 1000:8.3f} ms/query, "
+          f"intended person found {found / n_queries:.1%}")
+
+
+def bench_load(directory):
+    """
+    Time loading `directory` from its CSV files, compiling the graph
+    file, and loading again from the compiled file.
+    """
+    path = os.path.join(directory, degrees.CACHE)
+    existed = os.path.exists(path)
+    print(f"{directory}:")
+
+    reset()
+    start = time.perf_counter()
+    degrees.graph.load_csv(directory)
+    print(f"  {'csv load':>13}: {time.perf_counter() - start:8.3f}s")
+
+    start = time.perf_counter()
+    degrees.graph.save(path, fingerprint(directory))
+    print(f"  {'compile':>13}: {time.perf_counter() - start:8.3f}s")
+
+    reset()
+    start = time.perf_counter()
+    degrees.load_data(directory)
+    print(f"  {'cached load':>13}: {time.perf_counter() - start:8.3f}s")
+
+    # Leave a directory that had no compiled graph as it was found
+    reset()
+    if not existed:
+        os.remove(path)
+
+
+def bench_search(directory, n_queries, seed=0):
+    """
+    Run the same random queries through breadth-first and bidirectional
+    search, reporting nodes expanded and wall time for each.
+    """
+    reset()
+    degrees.load_data(directory)
+    rng = random.Random(seed)
+    person_ids = sorted(degrees.people)
+    queries = [
+        (rng.choice(person_ids), rng.choice(person_ids))
+        for _ in range(n_queries)
+    ]
+
+    print(f"{directory}: {len(degrees.people)} people, {n_queries} queries")
+    lengths = {}
+    for bidirectional in (False, True):
+        expanded = 0
+        lengths[bidirectional] = []
+        start = time.perf_counter()
+        for source, target in queries:
+            if source == target:
+                continue
+            stats = SearchStats()
+            path = degrees.shortest_path(source, target, bidirectional=bidirectional, stats=stats)
+            lengths[bidirectional].append(path if path is None else len(path))
+            expanded += stats.expanded
+        elapsed = time.perf_counter() - start
+        name = "bidirectional" if bidirectional else "bfs"
+        print(f"  {name:>13}: {expanded:>10} nodes expanded, {elapsed:8.3f}s")
+
+    if lengths[False] != lengths[True]:
+        print("  warning: path lengths differ between the two searches")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,136 @@
+import argparse
 import csv
+import json
+import os
 import sys
+import threading
+import time
+from collections import Counter, deque
+from multiprocessing import Pool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import Graph, MoviesView, NamesView, PeopleView, edit_distance, fingerprint
+from oracle import Landmarks, PathCache
+from util import SearchStats, breadth_first_search, bidirectional_search
+
+# Star graph with people and movies interned to dense integers
+graph = Graph()
 
 # Maps names to a set of corresponding person_ids
-names = {}
+names = NamesView(graph)
 
 # Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
-people = {}
+people = PeopleView(graph)
 
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
-movies = {}
+movies = MoviesView(graph)
+
+
+# Optional PathCache and Landmarks consulted by shortest_path, set up by main()
+path_cache = None
+landmarks = None
+
+# Compiled graph file kept next to the CSV files it was built from
+CACHE = "degrees.cache"
 
+# Latency percentiles are reported over this many of the latest queries
+LATENCY_WINDOW = 10000
 
-def load_data(directory):
+
+def load_data(directory, cache=True):
     """
     Load data from CSV files into memory.
+
+    If `cache` is true, memory-map the compiled graph in `directory`
+    instead, compiling it first if it is missing or out of date.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
+    if not cache:
+        graph.load_csv(directory)
+        return
+
+    path = os.path.join(directory, CACHE)
+    sources = fingerprint(directory)
+    if graph.load_cache(path, sources):
+        return
 
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    graph.load_csv(directory)
+    try:
+        graph.save(path, sources)
+    except OSError:
+        # A read-only data directory just means no cache
+        pass
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(usage="python degrees.py [directory] [options]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    parser.add_argument("--compile", action="store_true",
+                        help="rebuild the compiled graph file and exit")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always load from the CSV files")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer name pairs from a CSV file ('-' for stdin) as JSON lines")
+    parser.add_argument("--serve", metavar="PORT", type=int,
+                        help="answer queries over HTTP on localhost:PORT")
+    parser.add_argument("--histogram", metavar="NAME", nargs="*",
+                        help="count everyone by degrees of separation from NAMEs (default: everyone)")
+    parser.add_argument("--processes", type=int,
+                        help="worker processes for --histogram (default: one per core)")
+    parser.add_argument("--cache", metavar="N", type=int, default=0,
+                        help="remember the answers to the last N queries")
+    parser.add_argument("--landmarks", metavar="K", type=int, default=0,
+                        help="precompute search trees from the K best-connected people")
+    parser.add_argument("--profile", action="store_true",
+                        help="report search counters and timings as JSON")
+    args = parser.parse_args()
+    directory = args.directory
+
+    if args.compile:
+        graph.load_csv(directory)
+        graph.save(os.path.join(directory, CACHE), fingerprint(directory))
+        print(f"Compiled {os.path.join(directory, CACHE)}.")
+        report_dangling(sys.stdout)
+        return
+
+    # Keep stdout free for results in batch and server modes
+    log = sys.stderr if args.batch or args.serve is not None else sys.stdout
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    print("Loading data...", file=log)
+    load_data(directory, cache=not args.no_cache)
+    print("Data loaded.", file=log)
+    report_dangling(log)
+    use_oracles(args.cache, args.landmarks)
+
+    if args.batch:
+        if args.batch == "-":
+            run_batch(sys.stdin, sys.stdout, bidirectional=args.bidirectional, profile=args.profile)
+        else:
+            with open(args.batch, encoding="utf-8", newline="") as f:
+                run_batch(f, sys.stdout, bidirectional=args.bidirectional, profile=args.profile)
+        return
+    if args.serve is not None:
+        serve(args.serve, bidirectional=args.bidirectional, profile=args.profile)
+        return
+    if args.histogram is not None:
+        if args.histogram:
+            sources = []
+            for name in args.histogram:
+                source = person_id_for_name(name)
+                if source is None:
+                    sys.exit(f"Person not found: {name}")
+                sources.append(source)
+        else:
+            sources = list(people)
+        counts = histogram(sources, directory=directory, processes=args.processes)
+        print(f"Degrees of separation from {len(sources)} people:")
+        for distance in sorted(d for d in counts if d >= 0):
+            print(f"  {distance}: {counts[distance]}")
+        print(f"  Not connected: {counts[-1]}")
+        return
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -69,7 +139,10 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    stats = SearchStats() if args.profile else None
+    path = shortest_path(source, target, bidirectional=args.bidirectional, stats=stats)
+    if stats is not None:
+        print(json.dumps(stats.report()), file=sys.stderr)
 
     if path is None:
         print("Not connected.")
@@ -84,81 +157,171 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def use_oracles(cache_size, k):
+    """
+    Make shortest_path consult an LRU cache of the last `cache_size`
+    answers and trees from `k` landmarks, disabling either when 0.
+    """
+    global path_cache, landmarks
+    path_cache = PathCache(cache_size) if cache_size > 0 else None
+    landmarks = Landmarks(graph, k) if k > 0 else None
+
+
+def oracle_stats():
+    """
+    Returns the hit ratio and latency counters of the cache and landmarks.
+    """
+    stats = {}
+    if path_cache is not None:
+        stats["cache"] = path_cache.stats()
+    if landmarks is not None:
+        stats["landmarks"] = landmarks.stats()
+    return stats
+
+
+def report_dangling(log):
+    """
+    Print how many stars.csv rows named a person or movie that does not
+    exist, and how many rows of each file were missing columns.
+    """
+    for column, count in graph.dangling.items():
+        if count:
+            print(f"Skipped {count} stars with an unknown {column}.", file=log)
+    for filename, count in graph.skipped.items():
+        if count:
+            print(f"Skipped {count} rows of {filename} with missing columns.", file=log)
+
+
+def shortest_path(source, target, bidirectional=False, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    If `bidirectional` is true, search from both people at once and
+    meet in the middle instead of expanding outwards from the source.
+
+    If `stats` is a SearchStats, the query is counted and timed in it.
+
     If no possible path, returns None.
     """
+    if stats is not None:
+        start = time.perf_counter()
 
-    # Initialize frontier (breadth-first search) and add source to starting position
-    start = Node(state=source, parent=None, action=None)
-    frontier = QueueFrontier()
-    frontier.add(start)
-
-    # Initialize an empty explored set
-    explored = set()
+    if path_cache is not None:
+        found, path = path_cache.get((source, target))
+        if found:
+            if stats is not None:
+                stats.answered_by = "cache"
+                stats.seconds = time.perf_counter() - start
+            return path
 
-    # Loop until solution found
-    while True:
-        # If nothing left in frontier, then no path
-        if frontier.empty():
-            return None
+    path = search(graph.person(source), graph.person(target), bidirectional, stats)
 
-        # Remove a node from the frontier and store it in node for analisys
-        node = frontier.remove()
+    # Translate the dense integers back to IMDb ids
+    if path is not None:
+        path = [
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in path
+        ]
+    if path_cache is not None:
+        path_cache.put((source, target), path)
+    if stats is not None:
+        stats.seconds = time.perf_counter() - start
+    return path
 
-        # Mark node as explored
-        explored.add(node.state)
 
-        for action, state in neighbors_for_person(node.state): 
-            # Return Solution if target found in neighbor
-            if state == target:
-                path = []
+def search(source, target, bidirectional=False, stats=None):
+    """
+    Returns the shortest list of (movie, person) pairs of dense indexes
+    that connect `source` to `target`, or None if there is no path,
+    asking the landmarks before falling back to a search.
+    """
+    if source is None or target is None:
+        return None
 
-                # Add current neighbor action/state (target found state)
-                path.append((action, state))
+    # A search from someone to themselves finds them in their own movie,
+    # which the landmarks' distances do not describe
+    if landmarks is not None and source != target:
+        known, path = landmarks.answer(source, target)
+        if known:
+            if stats is not None:
+                stats.answered_by = "landmarks"
+            return path
 
-                # Populates path whith furder (previous) states if any
-                while node.parent is not None:
-                    path.append((node.action, node.state))
-                    node = node.parent
-   
-                # Reverse path 
-                path.reverse()
-                return path
-            
-            # Add neighbors to frotier
-            if not frontier.contains_state(state) and state not in explored:
-                child = Node(state=state, parent=node, action=action)
-                frontier.add(child)
+    if bidirectional:
+        return bidirectional_search(source, target, graph.neighbors, stats)
+    else:
+        return breadth_first_search(source, target, graph.neighbors, stats)
 
 
-def person_id_for_name(name):
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If there is nobody by that name, offers the closest
+    names instead, ranked by candidates_for_name.
+
+    If `interactive` is false, ambiguous or unknown names return
+    None instead of asking which person was intended.
     """
     person_ids = list(names.get(name.lower(), set()))
-    if len(person_ids) == 0:
+    if len(person_ids) == 1:
+        return person_ids[0]
+    elif not interactive:
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
-        for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
-            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
-        try:
-            person_id = input("Intended Person ID: ")
-            if person_id in person_ids:
-                return person_id
-        except ValueError:
-            pass
-        return None
+        candidates = sorted(
+            ({"person_id": person_id, **people[person_id]} for person_id in person_ids),
+            key=lambda candidate: candidate["birth"]
+        )
     else:
-        return person_ids[0]
+        candidates = candidates_for_name(name)
+        if not candidates:
+            return None
+        print(f"No '{name}'. Did you mean:")
+
+    for candidate in candidates:
+        person_id = candidate["person_id"]
+        name = candidate["name"]
+        birth = candidate["birth"]
+        print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+    try:
+        person_id = input("Intended Person ID: ")
+        if person_id in (candidate["person_id"] for candidate in candidates):
+            return person_id
+    except ValueError:
+        pass
+    return None
+
+
+def candidates_for_name(name, limit=10, max_distance=2):
+    """
+    Returns up to `limit` people whose names are close to `name`, as
+    dictionaries of person_id, name, birth and distance, best first.
+
+    Names within edit distance `max_distance` come first, closest
+    first and then by birth year. Any places left are filled with
+    names that start with `name`.
+    """
+    matches = graph.similar_people(name, max_distance=max_distance, limit=limit)
+    found = {person for person, _ in matches}
+    for person in graph.people_with_prefix(name, limit=limit):
+        if len(matches) >= limit:
+            break
+        if person not in found:
+            distance = edit_distance(name.lower(), graph.lower_name(person), len(name) + 1)
+            matches.append((person, distance))
+    return [
+        {
+            "person_id": graph.person_ids[person],
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "distance": distance
+        }
+        for person, distance in matches
+    ]
 
 
 def neighbors_for_person(person_id):
@@ -166,12 +329,240 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
-    neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
-    return neighbors
+    person = graph.person(person_id)
+    if person is None:
+        raise KeyError(person_id)
+    return {
+        (graph.movie_ids[movie], graph.person_ids[star])
+        for movie, star in graph.neighbors(person)
+    }
+
+
+def distances_from(source):
+    """
+    Returns a dictionary mapping the person_id of everyone connected to
+    `source` to a (degrees, movie_id, person_id) triple: their degrees of
+    separation, and the movie and co-star through which a shortest path
+    from `source` reaches them (None for `source` itself).
+    """
+    person = graph.person(source)
+    if person is None:
+        raise KeyError(source)
+    distance, parent, via = graph.breadth_first_tree(person)
+    return {
+        graph.person_ids[person]: (
+            distance[person],
+            graph.movie_ids[via[person]] if parent[person] >= 0 else None,
+            graph.person_ids[parent[person]] if parent[person] >= 0 else None
+        )
+        for person in range(len(distance))
+        if distance[person] >= 0
+    }
+
+
+def histogram(sources, directory=None, processes=None):
+    """
+    Returns a Counter of everyone by degrees of separation from each of
+    the person_ids in `sources`, summed over all sources, with people
+    who are not connected counted under -1.
+
+    Sources are searched in a pool of `processes` worker processes,
+    which load `directory` themselves when they cannot inherit the
+    already loaded data.
+    """
+    sources = [graph.person(source) for source in sources]
+    counts = Counter()
+    if processes == 1 or len(sources) < 2:
+        for source in sources:
+            counts.update(source_histogram(source))
+        return counts
+
+    processes = processes or os.cpu_count() or 1
+    with Pool(processes, initializer=load_worker, initargs=(directory,)) as pool:
+        chunksize = max(1, len(sources) // (4 * processes))
+        for partial in pool.imap_unordered(source_histogram, sources, chunksize):
+            counts.update(partial)
+    return counts
+
+
+def load_worker(directory):
+    """
+    Load `directory` in a worker process that did not inherit the graph.
+    """
+    if directory is not None and not graph.person_ids:
+        load_data(directory)
+
+
+def source_histogram(source):
+    """
+    Returns a Counter of everyone by degrees of separation from the
+    dense person index `source`, with -1 counting people not connected.
+    """
+    distance, _, _ = graph.breadth_first_tree(source)
+    return Counter(distance)
+
+
+class QueryStats():
+    """
+    Latency and throughput counters for batch and server modes.
+
+    The count, total and slowest latency cover every query, while the
+    percentiles are taken over the last `window` of them, so a long-lived
+    server holds and sorts a bounded number of latencies.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.perf_counter()
+        self.latencies = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.slowest = max(self.slowest, seconds)
+
+    def report(self):
+        """
+        Return a dict of query count, queries/sec and latency percentiles.
+        """
+        elapsed = time.perf_counter() - self.started
+        with self.lock:
+            latencies = sorted(self.latencies)
+            count = self.count
+            total = self.total
+            slowest = self.slowest
+        report = {
+            "queries": count,
+            "seconds": elapsed,
+            "queries_per_second": count / elapsed if elapsed else 0.0
+        }
+        if count:
+            report["mean_latency"] = total / count
+            report["p50_latency"] = latencies[len(latencies) // 2]
+            report["p95_latency"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            report["max_latency"] = slowest
+        return report
+
+
+def answer(source_name, target_name, bidirectional=False, profile=False):
+    """
+    Answer one query by name without prompting, returning a dict ready to
+    be written as JSON. Names that are unknown or ambiguous are reported
+    in an "error" field rather than resolved interactively.
+
+    If `profile` is true, the search counters are added as "profile".
+    """
+    start = time.perf_counter()
+    result = {"source": source_name, "target": target_name}
+
+    person_ids = {}
+    for field, name in (("source", source_name), ("target", target_name)):
+        person_ids[field] = person_id_for_name(name, interactive=False)
+        if person_ids[field] is None:
+            found = names.get(name.lower())
+            result["error"] = f"{'Ambiguous' if found else 'Unknown'} {field} '{name}'."
+            result["candidates"] = candidates_for_name(name)
+            result["seconds"] = time.perf_counter() - start
+            return result
+
+    stats = SearchStats() if profile else None
+    path = shortest_path(
+        person_ids["source"], person_ids["target"], bidirectional=bidirectional, stats=stats
+    )
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [
+            {
+                "movie_id": movie_id,
+                "title": movies[movie_id]["title"],
+                "person_id": person_id,
+                "name": people[person_id]["name"]
+            }
+            for movie_id, person_id in path
+        ]
+    if stats is not None:
+        result["profile"] = stats.report()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(lines, output, bidirectional=False, profile=False):
+    """
+    Answer every source,target name pair in the CSV `lines`, writing one
+    JSON object per line to `output` and a latency report to stderr.
+    """
+    stats = QueryStats()
+    for row in csv.reader(lines):
+        if not row or not "".join(row).strip():
+            continue
+        if len(row) != 2:
+            result = {"error": f"Expected 2 names, got {len(row)}.", "row": row}
+        else:
+            result = answer(
+                row[0].strip(), row[1].strip(), bidirectional=bidirectional, profile=profile
+            )
+            stats.record(result["seconds"])
+        output.write(json.dumps(result) + "\n")
+    print(json.dumps({**stats.report(), **oracle_stats()}), file=sys.stderr)
+
+
+def serve(port, bidirectional=False, profile=False):
+    """
+    Keep the loaded graph resident and answer queries over HTTP:
+
+        GET /path?source=NAME&target=NAME  ->  result of `answer`
+        GET /names?q=NAME                  ->  candidates_for_name
+        GET /stats                         ->  QueryStats report
+    """
+    stats = QueryStats()
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/stats":
+                self.reply(200, {**stats.report(), **oracle_stats()})
+            elif url.path == "/names" and "q" in query:
+                self.reply(200, candidates_for_name(query["q"][0]))
+            elif url.path == "/path" and "source" in query and "target" in query:
+                result = answer(
+                    query["source"][0], query["target"][0],
+                    bidirectional=bidirectional, profile=profile
+                )
+                stats.record(result["seconds"])
+                self.reply(200, result)
+            else:
+                self.reply(404, {"error": "Use /path?source=NAME&target=NAME, /names?q=NAME or /stats."})
+
+        def reply(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving on http://127.0.0.1:{port}/", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps({**stats.report(), **oracle_stats()}), file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,703 @@
+import array
+import csv
+import json
+import mmap
+import os
+import sys
+from collections import Counter
+from collections.abc import Mapping, Sequence
+
+# Identifies a compiled graph file, and the layout version it was written with
+CACHE_MAGIC = b"DEGREES\0"
+CACHE_VERSION = 4
+
+# Read buffer size for the CSV files, so the loader reads in large chunks
+CHUNK_SIZE = 1 << 20
+
+# Files a compiled graph is derived from, and must be rebuilt when they change
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Graph columns stored in a compiled graph file
+STRINGS = (
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years", "gram_keys"
+)
+ARRAYS = (
+    "person_offsets", "person_movies", "movie_offsets", "movie_stars",
+    "person_order", "movie_order", "name_order", "gram_offsets", "gram_people"
+)
+
+
+class Graph():
+    """
+    The bipartite graph of people starring in movies.
+
+    IMDb ids are interned to dense integers: person `i` is
+    `person_ids[i]`, and movie `j` is `movie_ids[j]`. The star relation
+    is stored in both directions in CSR form, as an offsets array and an
+    index array, so the movies of person `i` are
+
+        person_movies[person_offsets[i]:person_offsets[i + 1]]
+
+    and likewise the stars of movie `j` are found through `movie_offsets`
+    and `movie_stars`.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """
+        Forget everything loaded into the graph.
+        """
+        self.person_ids = []
+        self.person_names = []
+        self.person_births = []
+        self.movie_ids = []
+        self.movie_titles = []
+        self.movie_years = []
+
+        self.person_offsets = array.array("q", [0])
+        self.person_movies = array.array("i")
+        self.movie_offsets = array.array("q", [0])
+        self.movie_stars = array.array("i")
+
+        # Dense integers sorted by IMDb id, and people sorted by lowercase
+        # name, so lookups are binary searches rather than per-entry dicts
+        self.person_order = array.array("i")
+        self.movie_order = array.array("i")
+        self.name_order = array.array("i")
+
+        # Trigram index over lowercase names: the people whose names contain
+        # gram_keys[g] are gram_people[gram_offsets[g]:gram_offsets[g + 1]].
+        # Each key is a trigram followed by a name length (see gram_key), so
+        # the names of every length that has it are listed separately
+        self.gram_keys = []
+        self.gram_offsets = array.array("q", [0])
+        self.gram_people = array.array("i")
+
+        # Number of stars.csv rows naming a person or movie that does not exist
+        self.dangling = {"person_id": 0, "movie_id": 0}
+
+        # Number of rows of each CSV file too short to have every column
+        self.skipped = {filename: 0 for filename in SOURCES}
+
+    def load_csv(self, directory):
+        """
+        Load people.csv, movies.csv and stars.csv from `directory`.
+        """
+        self.clear()
+
+        # Interning tables are only needed while stars.csv is read
+        person_index = {}
+        movie_index = {}
+
+        for person_id, name, birth in read_columns(
+            f"{directory}/people.csv", ("id", "name", "birth"), self.skipped
+        ):
+            if person_id in person_index:
+                continue
+            person_index[person_id] = len(self.person_ids)
+            self.person_ids.append(person_id)
+            self.person_names.append(name)
+            self.person_births.append(birth)
+
+        for movie_id, title, year in read_columns(
+            f"{directory}/movies.csv", ("id", "title", "year"), self.skipped
+        ):
+            if movie_id in movie_index:
+                continue
+            movie_index[movie_id] = len(self.movie_ids)
+            self.movie_ids.append(movie_id)
+            self.movie_titles.append(title)
+            self.movie_years.append(year)
+
+        # Collect the star relation as two parallel edge arrays, counting
+        # rather than storing rows that refer to unknown people or movies
+        star_people = array.array("i")
+        star_movies = array.array("i")
+        dangling_people = dangling_movies = 0
+        for person_id, movie_id in read_columns(
+            f"{directory}/stars.csv", ("person_id", "movie_id"), self.skipped
+        ):
+            person = person_index.get(person_id)
+            movie = movie_index.get(movie_id)
+            if person is None:
+                dangling_people += 1
+            elif movie is None:
+                dangling_movies += 1
+            else:
+                star_people.append(person)
+                star_movies.append(movie)
+        del person_index, movie_index
+        self.dangling = {"person_id": dangling_people, "movie_id": dangling_movies}
+
+        self.person_offsets, self.person_movies = compress(
+            len(self.person_ids), star_people, star_movies
+        )
+        self.movie_offsets, self.movie_stars = compress(
+            len(self.movie_ids), star_movies, star_people
+        )
+        del star_people, star_movies
+        self.sort_indexes()
+
+    def save(self, path, fingerprint):
+        """
+        Write the graph to a compiled graph file at `path`, tagged with the
+        `fingerprint` of the CSV files it was loaded from.
+        """
+        sections = []
+        for name in STRINGS:
+            offsets, data = encode_strings(getattr(self, name))
+            sections.append((f"{name}.offsets", offsets))
+            sections.append((f"{name}.data", data))
+        for name in ARRAYS:
+            sections.append((name, getattr(self, name)))
+
+        # Lay the sections out one after another, 8-byte aligned
+        layout = {}
+        position = 0
+        for name, section in sections:
+            size = len(section) * getattr(section, "itemsize", 1)
+            layout[name] = [position, size, getattr(section, "typecode", "B")]
+            position += size + (-size % 8)
+
+        header = json.dumps({
+            "version": CACHE_VERSION,
+            "byteorder": sys.byteorder,
+            "fingerprint": fingerprint,
+            "dangling": self.dangling,
+            "skipped": self.skipped,
+            "sections": layout
+        }).encode("utf-8")
+        header += b" " * (-len(header) % 8)
+
+        # Write to a temporary file first so readers never see half a file
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(CACHE_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for name, section in sections:
+                data = section if isinstance(section, bytes) else section.tobytes()
+                f.write(data)
+                f.write(b"\0" * (-len(data) % 8))
+        os.replace(temporary, path)
+
+    def load_cache(self, path, fingerprint):
+        """
+        Memory-map the compiled graph file at `path`.
+
+        Returns False, leaving the graph untouched, if the file is missing,
+        was written by another version, or does not match `fingerprint`.
+        """
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+
+        if buffer[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+            return False
+        start = len(CACHE_MAGIC) + 8
+        length = int.from_bytes(buffer[len(CACHE_MAGIC):start], "little")
+        try:
+            header = json.loads(bytes(buffer[start:start + length]))
+        except ValueError:
+            return False
+        if (header.get("version") != CACHE_VERSION
+                or header.get("byteorder") != sys.byteorder
+                or header.get("fingerprint") != fingerprint):
+            return False
+
+        # Every section is a zero-copy view into the mapped file
+        data = memoryview(buffer)[start + length:]
+        if any(offset + size > len(data) for offset, size, _ in header["sections"].values()):
+            return False
+        sections = {
+            name: data[offset:offset + size].cast(typecode)
+            for name, (offset, size, typecode) in header["sections"].items()
+        }
+        self.clear()
+        for name in STRINGS:
+            setattr(self, name, StringTable(
+                sections[f"{name}.offsets"], sections[f"{name}.data"]
+            ))
+        for name in ARRAYS:
+            setattr(self, name, sections[name])
+        self.dangling = header["dangling"]
+        self.skipped = header.get("skipped", self.skipped)
+        return True
+
+    def sort_indexes(self):
+        """
+        Build the sorted orders used to look up ids and names.
+        """
+        self.person_order = array.array("i", sorted(
+            range(len(self.person_ids)), key=self.person_ids.__getitem__
+        ))
+        self.movie_order = array.array("i", sorted(
+            range(len(self.movie_ids)), key=self.movie_ids.__getitem__
+        ))
+        self.name_order = array.array("i", sorted(
+            range(len(self.person_names)), key=self.lower_name
+        ))
+
+        postings = {}
+        for person in range(len(self.person_names)):
+            name = self.lower_name(person)
+            for gram in trigrams(name):
+                key = gram_key(gram, len(name))
+                if key not in postings:
+                    postings[key] = array.array("i")
+                postings[key].append(person)
+        self.gram_keys = sorted(postings)
+        self.gram_offsets = array.array("q", [0])
+        self.gram_people = array.array("i")
+        for gram in self.gram_keys:
+            self.gram_people.extend(postings[gram])
+            self.gram_offsets.append(len(self.gram_people))
+
+    def lower_name(self, person):
+        return self.person_names[person].lower()
+
+    def person(self, person_id):
+        """
+        Return the dense index of the person with IMDb id `person_id`,
+        or None if there is no such person.
+        """
+        i = bisect(self.person_order, self.person_ids.__getitem__, person_id)
+        if i < len(self.person_order) and self.person_ids[self.person_order[i]] == person_id:
+            return self.person_order[i]
+        return None
+
+    def movie(self, movie_id):
+        """
+        Return the dense index of the movie with IMDb id `movie_id`,
+        or None if there is no such movie.
+        """
+        i = bisect(self.movie_order, self.movie_ids.__getitem__, movie_id)
+        if i < len(self.movie_order) and self.movie_ids[self.movie_order[i]] == movie_id:
+            return self.movie_order[i]
+        return None
+
+    def people_named(self, name):
+        """
+        Return the dense indexes of everyone whose lowercase name is `name`.
+        """
+        people = []
+        i = bisect(self.name_order, self.lower_name, name)
+        while i < len(self.name_order) and self.lower_name(self.name_order[i]) == name:
+            people.append(self.name_order[i])
+            i += 1
+        return people
+
+    def people_with_prefix(self, prefix, limit=10):
+        """
+        Return the dense indexes of up to `limit` people whose lowercase
+        names start with `prefix`, in name order.
+        """
+        people = []
+        prefix = prefix.lower()
+        i = bisect(self.name_order, self.lower_name, prefix)
+        while (i < len(self.name_order) and len(people) < limit
+               and self.lower_name(self.name_order[i]).startswith(prefix)):
+            people.append(self.name_order[i])
+            i += 1
+        return people
+
+    def similar_people(self, name, max_distance=2, limit=10):
+        """
+        Return up to `limit` (person, distance) pairs for the people whose
+        lowercase names are within edit distance `max_distance` of `name`,
+        closest first.
+        """
+        name = name.lower()
+
+        # Only names whose lengths are within `max_distance` can be close
+        # enough, so only their postings are read
+        ranges = {
+            gram: self.gram_ranges(gram, len(name) - max_distance, len(name) + max_distance)
+            for gram in trigrams(name)
+        }
+
+        # Each edit changes at most three of a name's trigrams, so anyone
+        # close enough shares all but 3 * max_distance of them, and at
+        # least `read - 3 * max_distance` of the `read` rarest. Everyone in
+        # the posting lists of the rarest is counted, and those who could
+        # still share enough are looked up in the lists of the commonest,
+        # which cover much of the dataset, rather than counting them all.
+        # Only candidates sharing enough have their edit distance checked.
+        grams = sorted(ranges, key=lambda gram: sum(end - start for start, end in ranges[gram]))
+        needed = len(grams) - 3 * max_distance
+        read = max(needed, min(len(grams), 3 * max_distance + 1))
+        shared = Counter()
+        for gram in grams[:read]:
+            for start, end in ranges[gram]:
+                shared.update(self.gram_people[start:end])
+        if read < len(grams):
+            possible = {person for person, count in shared.items()
+                        if count >= read - 3 * max_distance}
+            for gram in grams[read:]:
+                for start, end in ranges[gram]:
+                    shared.update(possible.intersection(self.gram_people[start:end]))
+        candidates = [person for person, count in shared.items() if count >= needed]
+
+        matches = []
+        for person in candidates:
+            other = self.lower_name(person)
+            # The same holds from the other name's side
+            if shared[person] < len(trigrams(other)) - 3 * max_distance:
+                continue
+            distance = edit_distance(name, other, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, other, self.person_births[person], person))
+        matches.sort()
+        return [(person, distance) for distance, _, _, person in matches[:limit]]
+
+    def gram_ranges(self, gram, shortest, longest):
+        """
+        Return the (start, end) of the posting list in gram_people of
+        `gram` for each length of name from `shortest` to `longest` that
+        has it.
+        """
+        keys = self.gram_keys
+        i = bisect(range(len(keys)), keys.__getitem__, gram_key(gram, max(shortest, 0)))
+        last = gram_key(gram, longest)
+        ranges = []
+        while i < len(keys) and keys[i] <= last:
+            ranges.append((self.gram_offsets[i], self.gram_offsets[i + 1]))
+            i += 1
+        return ranges
+
+    def movies_of(self, person):
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_of(self, movie):
+        return self.movie_stars[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def neighbors(self, person):
+        """
+        Return (movie, person) pairs of dense indexes for everyone who
+        starred in a movie with `person`.
+        """
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        return [
+            (movie, star)
+            for movie in self.movies_of(person)
+            for star in movie_stars[movie_offsets[movie]:movie_offsets[movie + 1]]
+        ]
+
+    def breadth_first_tree(self, source):
+        """
+        Search outwards from `source` until everyone reachable is found.
+
+        Returns three arrays indexed by person: the degrees of separation
+        from `source` (-1 if not connected), and the person and movie each
+        person was first reached through (-1 for `source` and anyone not
+        connected), which together form a shortest-path tree.
+        """
+        n = len(self.person_ids)
+        distance = array.array("i", [-1]) * n
+        parent = array.array("i", [-1]) * n
+        via = array.array("i", [-1]) * n
+
+        # Every star of a movie is reached the first time the movie is,
+        # so each movie only needs expanding once
+        expanded = bytearray(len(self.movie_ids))
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+
+        distance[source] = 0
+        layer = [source]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for person in layer:
+                for movie in person_movies[person_offsets[person]:person_offsets[person + 1]]:
+                    if expanded[movie]:
+                        continue
+                    expanded[movie] = 1
+                    for star in movie_stars[movie_offsets[movie]:movie_offsets[movie + 1]]:
+                        if distance[star] < 0:
+                            distance[star] = depth
+                            parent[star] = person
+                            via[star] = movie
+                            next_layer.append(star)
+            layer = next_layer
+
+        return distance, parent, via
+
+    def tree_path(self, tree, target):
+        """
+        Return the (movie, person) pairs leading to `target` in a tree from
+        `breadth_first_tree`, or None if `target` is not connected to its root.
+        """
+        distance, parent, via = tree
+        if distance[target] < 0:
+            return None
+        path = []
+        while parent[target] >= 0:
+            path.append((via[target], target))
+            target = parent[target]
+        path.reverse()
+        return path
+
+
+def compress(n, sources, targets):
+    """
+    Turn the parallel edge arrays `sources` and `targets` into CSR form
+    over `n` source nodes, returning the offsets and index arrays.
+    """
+    offsets = array.array("q", bytes(8 * (n + 1)))
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+
+    # Scatter each edge into the next free slot of its source's row
+    index = array.array("i", bytes(4 * len(sources)))
+    position = offsets[:-1]
+    for source, target in zip(sources, targets):
+        index[position[source]] = target
+        position[source] += 1
+
+    return offsets, index
+
+
+def read_columns(path, columns, skipped=None):
+    """
+    Yield the named `columns` of every row of the CSV file at `path`,
+    as tuples in the order given, reading the file in large chunks.
+
+    Rows too short to have every column are skipped, and if `skipped` is
+    a dictionary, their number is stored in it under the file's name.
+    Blank lines are passed over without being counted.
+    """
+    short = 0
+    with open(path, encoding="utf-8", newline="", buffering=CHUNK_SIZE) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        try:
+            positions = [header.index(column) for column in columns]
+        except ValueError:
+            raise ValueError(f"{path} must have columns {', '.join(columns)}")
+
+        # Unpacking by position is much cheaper than building a dict per row
+        width = max(positions) + 1
+        if positions == list(range(len(columns))):
+            for row in reader:
+                if len(row) == width:
+                    yield row
+                elif len(row) > width:
+                    yield row[:width]
+                elif row:
+                    short += 1
+        else:
+            for row in reader:
+                if len(row) >= width:
+                    yield [row[position] for position in positions]
+                elif row:
+                    short += 1
+
+    if skipped is not None:
+        skipped[os.path.basename(path)] = short
+
+
+def fingerprint(directory):
+    """
+    Return the sizes and modification times of the CSV files in
+    `directory`, which change whenever the data does.
+    """
+    fingerprint = {}
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        fingerprint[filename] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+class StringTable(Sequence):
+    """
+    Sequence of strings stored as UTF-8 in one buffer, where string `i`
+    is `data[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __getitem__(self, i):
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def encode_strings(strings):
+    """
+    Return the offsets array and UTF-8 buffer for a StringTable of `strings`.
+    """
+    offsets = array.array("q", [0])
+    data = bytearray()
+    for string in strings:
+        data += string.encode("utf-8")
+        offsets.append(len(data))
+    return offsets, bytes(data)
+
+
+def trigrams(name):
+    """
+    Return the set of three-character substrings of `name`, padded so
+    that its start and end count too.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def gram_key(gram, length):
+    """
+    Return the key of the posting list of `gram` among names of `length`
+    characters. Keys sort by trigram, then by length.
+    """
+    return f"{gram}{length:04d}"
+
+
+def edit_distance(a, b, limit):
+    """
+    Return the Levenshtein distance between `a` and `b`, or `limit + 1`
+    as soon as it is certain to be more than `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    # Every edit adds or removes at most one of each name's characters, so
+    # names whose letters differ by more than `limit` need not be aligned
+    extra = Counter(a)
+    extra.subtract(b)
+    if max(sum(n for n in extra.values() if n > 0), -sum(n for n in extra.values() if n < 0)) > limit:
+        return limit + 1
+
+    # A shared prefix and suffix cost nothing to align
+    start = len(os.path.commonprefix((a, b)))
+    end = 0
+    while end < min(len(a), len(b)) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+
+    # Only cells within `limit` of the diagonal can stay within `limit`
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i, x in enumerate(a, 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (x != b[j - 1])
+            )
+        if min(current) > limit:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+def bisect(order, key, value):
+    """
+    Return the first position in `order` whose key is not less than `value`.
+    """
+    lo, hi = 0, len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if key(order[mid]) < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class PeopleView(Mapping):
+    """
+    Read-only view of a Graph in the shape of the original `people`
+    dict: person_id -> {"name", "birth", "movies": set of movie_ids}.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {graph.movie_ids[movie] for movie in graph.movies_of(person)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Read-only view of a Graph in the shape of the original `movies`
+    dict: movie_id -> {"title", "year", "stars": set of person_ids}.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie(movie_id)
+        if movie is None:
+            raise KeyError(movie_id)
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[star] for star in graph.stars_of(movie)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class NamesView(Mapping):
+    """
+    Read-only view of a Graph in the shape of the original `names`
+    dict: lowercase name -> set of person_ids.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        people = self.graph.people_named(name)
+        if not people:
+            raise KeyError(name)
+        return {self.graph.person_ids[person] for person in people}
+
+    def __iter__(self):
+        previous = None
+        for person in self.graph.name_order:
+            name = self.graph.lower_name(person)
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
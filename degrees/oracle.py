@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PathCache():
+    """
+    Least-recently-used cache of shortest_path answers, keyed by
+    (source, target) and holding at most `maxsize` of them.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # The server answers queries from several threads at once
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return (True, answer) if `key` is cached, or (False, None).
+        """
+        with self.lock:
+            try:
+                answer = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, answer
+
+    def put(self, key, answer):
+        with self.lock:
+            self.entries[key] = answer
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+class Landmarks():
+    """
+    Shortest-path trees from the `k` people with the most co-stars.
+
+    Distances to a landmark bound the distance between any two people:
+
+        |d(L, s) - d(L, t)|  <=  d(s, t)  <=  d(L, s) + d(L, t)
+
+    When the bounds meet, the path through that landmark is a shortest
+    path and no search is needed. When exactly one of the two people is
+    connected to a landmark, they cannot be connected to each other.
+    """
+
+    def __init__(self, graph, k):
+        self.graph = graph
+        self.people = sorted(
+            range(len(graph.person_ids)), key=self.co_stars, reverse=True
+        )[:k]
+        self.trees = [graph.breadth_first_tree(person) for person in self.people]
+        self.answered = 0
+        self.pruned = 0
+        self.searched = 0
+        self.seconds = 0.0
+
+        # The server answers queries from several threads at once
+        self.lock = threading.Lock()
+
+    def co_stars(self, person):
+        """
+        Return the number of co-star credits of `person`, counting a
+        co-star once per shared movie.
+        """
+        graph = self.graph
+        return sum(
+            graph.movie_offsets[movie + 1] - graph.movie_offsets[movie]
+            for movie in graph.movies_of(person)
+        )
+
+    def bounds(self, source, target):
+        """
+        Return (lower, upper) bounds on the degrees of separation between
+        `source` and `target`, with (None, None) if they are certainly
+        not connected and None for an unknown upper bound.
+        """
+        lower = 0
+        upper = None
+        for distance, _, _ in self.trees:
+            to_source = distance[source]
+            to_target = distance[target]
+            if (to_source < 0) != (to_target < 0):
+                return None, None
+            if to_source < 0:
+                continue
+            lower = max(lower, abs(to_source - to_target))
+            if upper is None or to_source + to_target < upper:
+                upper = to_source + to_target
+        return lower, upper
+
+    def answer(self, source, target):
+        """
+        Try to answer a query between dense person indexes without a search.
+
+        Returns (True, path) with the list of (movie, person) pairs, or
+        (True, None) if they are not connected, when the landmarks decide
+        the answer; otherwise (False, None).
+        """
+        start = time.perf_counter()
+        try:
+            lower, upper = self.bounds(source, target)
+            if lower is None:
+                with self.lock:
+                    self.pruned += 1
+                return True, None
+            if upper is not None and lower == upper:
+                for root, tree in zip(self.people, self.trees):
+                    distance = tree[0]
+                    if distance[source] >= 0 and distance[source] + distance[target] == upper:
+                        with self.lock:
+                            self.answered += 1
+                        return True, self.path_through(root, tree, source, target)
+            with self.lock:
+                self.searched += 1
+            return False, None
+        finally:
+            with self.lock:
+                self.seconds += time.perf_counter() - start
+
+    def path_through(self, root, tree, source, target):
+        """
+        Return the (movie, person) pairs leading from `source` up to
+        `root`, the root of `tree`, and back down to `target`.
+        """
+        up = self.graph.tree_path(tree, source)
+        down = self.graph.tree_path(tree, target)
+
+        # Walking the root-to-source path backwards, each movie leads to
+        # the person before it on the way down
+        previous = [root] + [person for _, person in up[:-1]]
+        path = [(movie, person) for (movie, _), person in zip(up, previous)]
+        path.reverse()
+        return path + down
+
+    def stats(self):
+        with self.lock:
+            answered, pruned, searched = self.answered, self.pruned, self.searched
+            seconds = self.seconds
+        queries = answered + pruned + searched
+        return {
+            "landmarks": len(self.people),
+            "answered": answered,
+            "pruned": pruned,
+            "searched": searched,
+            "hit_ratio": (answered + pruned) / queries if queries else 0.0,
+            "mean_latency": seconds / queries if queries else 0.0
+        }
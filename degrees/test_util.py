@@ -0,0 +1,44 @@
+import os
+import unittest
+
+import degrees
+from util import bidirectional_search, breadth_first_search
+
+
+SMALL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+
+
+class SearchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        degrees.load_data(SMALL, cache=False)
+
+    def test_same_person(self):
+        # Kevin Bacon, who reaches himself through one of his movies
+        for bidirectional in (False, True):
+            path = degrees.shortest_path("102", "102", bidirectional=bidirectional)
+            self.assertEqual(len(path), 1)
+            self.assertEqual(path[0][1], "102")
+        self.assertEqual(
+            degrees.shortest_path("102", "102", bidirectional=True),
+            degrees.shortest_path("102", "102")
+        )
+
+    def test_same_state(self):
+        links = {
+            "a": [("x", "b")],
+            "b": [("x", "a"), ("y", "c")],
+            "c": [("y", "b")],
+            "d": []
+        }
+        neighbors = links.__getitem__
+        for state in links:
+            self.assertEqual(
+                bidirectional_search(state, state, neighbors),
+                breadth_first_search(state, state, neighbors)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
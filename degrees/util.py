@@ -1,3 +1,7 @@
+import time
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -7,13 +11,17 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+
+        # Count of nodes per state, so membership checks need no scan
+        self.states = {}
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,10 +30,17 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.discard_state(node.state)
             return node
 
+    def discard_state(self, state):
+        count = self.states[state] - 1
+        if count:
+            self.states[state] = count
+        else:
+            del self.states[state]
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +48,212 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.discard_state(node.state)
             return node
+
+
+class SearchStats():
+    """
+    Counters for one search, filled in when passed to a search function
+    as `stats`. Searches run without it pay nothing for the counters.
+    """
+
+    def __init__(self):
+        self.answered_by = "search"
+        self.expanded = 0
+        self.peak_frontier = 0
+        self.explored = 0
+        self.neighbor_seconds = 0.0
+        self.seconds = 0.0
+
+    def watch(self, neighbors, frontier_size, explored_size):
+        """
+        Wrap `neighbors` so that every call counts as an expansion, its
+        time is added up, and the sizes reported by `frontier_size()` and
+        `explored_size()` are recorded.
+        """
+        def watched(state):
+            self.expanded += 1
+            self.peak_frontier = max(self.peak_frontier, frontier_size())
+            self.explored = explored_size()
+            start = time.perf_counter()
+            result = neighbors(state)
+            self.neighbor_seconds += time.perf_counter() - start
+            return result
+        return watched
+
+    def report(self):
+        return {
+            "answered_by": self.answered_by,
+            "nodes_expanded": self.expanded,
+            "peak_frontier": self.peak_frontier,
+            "explored": self.explored,
+            "neighbor_seconds": self.neighbor_seconds,
+            "seconds": self.seconds
+        }
+
+
+def breadth_first_search(source, target, neighbors, stats=None):
+    """
+    Search outwards from `source` one layer at a time until `target`
+    is found, following `neighbors(state)` as (action, state) pairs.
+
+    Returns the shortest list of (action, state) pairs that lead from
+    `source` to `target`, or None if they are not connected. If `stats`
+    is a SearchStats, the search is counted in it.
+    """
+
+    # Initialize frontier (breadth-first search) and add source to starting position
+    start = Node(state=source, parent=None, action=None)
+    frontier = QueueFrontier()
+    frontier.add(start)
+
+    # Initialize an empty explored set
+    explored = set()
+
+    if stats is not None:
+        neighbors = stats.watch(
+            neighbors, lambda: len(frontier.frontier) + 1, lambda: len(explored)
+        )
+
+    # Loop until solution found
+    while True:
+        # If nothing left in frontier, then no path
+        if frontier.empty():
+            return None
+
+        # Remove a node from the frontier and store it in node for analisys
+        node = frontier.remove()
+
+        # Mark node as explored
+        explored.add(node.state)
+
+        for action, state in neighbors(node.state):
+            # Return Solution if target found in neighbor
+            if state == target:
+                path = []
+
+                # Add current neighbor action/state (target found state)
+                path.append((action, state))
+
+                # Populates path whith furder (previous) states if any
+                while node.parent is not None:
+                    path.append((node.action, node.state))
+                    node = node.parent
+
+                # Reverse path
+                path.reverse()
+                return path
+
+            # Add neighbors to frotier
+            if not frontier.contains_state(state) and state not in explored:
+                child = Node(state=state, parent=node, action=action)
+                frontier.add(child)
+
+
+def bidirectional_search(source, target, neighbors, stats=None):
+    """
+    Search outwards from `source` and `target` at the same time, one
+    breadth-first layer at a time, until the two searches meet.
+
+    `neighbors(state)` must return (action, state) pairs and describe an
+    undirected graph, so the same function can be followed from either end.
+
+    Returns the shortest list of (action, state) pairs that lead from
+    `source` to `target`, or None if they are not connected. If `stats`
+    is a SearchStats, the search is counted in it.
+    """
+    # Map every reached state to its Node on each side of the search
+    forward = {source: Node(state=source, parent=None, action=None)}
+    backward = {target: Node(state=target, parent=None, action=None)}
+    forward_layer = [forward[source]]
+    backward_layer = [backward[target]]
+
+    if stats is not None:
+        neighbors = stats.watch(
+            neighbors,
+            lambda: len(forward_layer) + len(backward_layer),
+            lambda: len(forward) + len(backward)
+        )
+
+    if source == target:
+        return round_trip(source, neighbors)
+
+    while forward_layer and backward_layer:
+        # Always grow the smaller side, so neither frontier explodes
+        if len(forward_layer) <= len(backward_layer):
+            forward_layer, meeting = expand_layer(
+                forward_layer, forward, backward, neighbors
+            )
+        else:
+            backward_layer, meeting = expand_layer(
+                backward_layer, backward, forward, neighbors
+            )
+
+        # The first state reached by both searches lies on a shortest path
+        if meeting is not None:
+            return join_paths(forward[meeting], backward[meeting])
+
+    return None
+
+
+def round_trip(source, neighbors):
+    """
+    Return the path breadth_first_search finds from `source` to itself,
+    which must leave it: through the first neighbor that is `source`
+    itself, or else out to the first neighbor and back. Returns None if
+    `source` has no neighbors.
+    """
+    steps = list(neighbors(source))
+    for action, state in steps:
+        if state == source:
+            return [(action, state)]
+    for action, state in steps[:1]:
+        for back, home in neighbors(state):
+            if home == source:
+                return [(action, state), (back, home)]
+    return None
+
+
+def expand_layer(layer, reached, other, neighbors):
+    """
+    Expand every node in `layer`, recording new states in `reached`.
+
+    Returns the next layer and the first state also reached by `other`,
+    or None if the two searches have not met yet.
+    """
+    next_layer = []
+    for node in layer:
+        for action, state in neighbors(node.state):
+            if state in reached:
+                continue
+            child = Node(state=state, parent=node, action=action)
+            reached[state] = child
+            if state in other:
+                return next_layer, state
+            next_layer.append(child)
+    return next_layer, None
+
+
+def join_paths(forward_node, backward_node):
+    """
+    Join the two halves of a bidirectional search that met at the
+    same state into one list of (action, state) pairs.
+    """
+    path = []
+
+    # Walk from the meeting point back to the source...
+    node = forward_node
+    while node.parent is not None:
+        path.append((node.action, node.state))
+        node = node.parent
+    path.reverse()
+
+    # ...then from the meeting point on to the target
+    node = backward_node
+    while node.parent is not None:
+        path.append((node.action, node.parent.state))
+        node = node.parent
+
+    return path
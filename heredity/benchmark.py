@@ -0,0 +1,464 @@
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+import heredity
+import inference
+import sampling
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for heredity.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    eliminate = commands.add_parser("inference", help="check and time exact inference by elimination")
+    eliminate.add_argument("--validate", type=int, nargs="+", default=[3, 4, 5, 6],
+                           help="sizes of random pedigrees to check against enumeration (default: 3 4 5 6)")
+    eliminate.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                           help="sizes of random pedigrees to time (default: 100 1000 10000)")
+    eliminate.add_argument("--seed", type=int, default=0)
+
+    joint = commands.add_parser("joint", help="time joint_probability against the original")
+    joint.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200],
+                       help="sizes of random pedigrees to time besides the families (default: 10 50 200)")
+    joint.add_argument("--assignments", type=int, default=20000,
+                       help="random assignments to evaluate for each pedigree (default: 20000)")
+    joint.add_argument("--seed", type=int, default=0)
+
+    enumerate_ = commands.add_parser("enumerate", help="time enumeration against the original")
+    enumerate_.add_argument("--sizes", type=int, nargs="+", default=[7, 8, 9],
+                            help="sizes of random pedigrees to time besides the families (default: 7 8 9)")
+    enumerate_.add_argument("--seed", type=int, default=0)
+
+    parallel = commands.add_parser("parallel", help="time enumeration across worker processes")
+    parallel.add_argument("--sizes", type=int, nargs="+", default=[8, 9],
+                          help="sizes of random pedigrees to time (default: 8 9)")
+    parallel.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4],
+                          help="numbers of worker processes to time (default: 1 2 4)")
+    parallel.add_argument("--seed", type=int, default=0)
+
+    sample = commands.add_parser("sample", help="check Gibbs sampling against exact inference")
+    sample.add_argument("--samples", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="sample budgets to run (default: 1000 10000 100000)")
+    sample.add_argument("--sizes", type=int, nargs="+", default=[100, 500],
+                        help="sizes of random pedigrees to check besides the families (default: 100 500)")
+    sample.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "sample":
+        pedigrees = [(filename, heredity.load_data(filename))
+                     for filename in ("data/family0.csv", "data/family1.csv", "data/family2.csv")]
+        pedigrees += [(f"random {size}", random_pedigree(size, seed=args.seed)) for size in args.sizes]
+        for name, people in pedigrees:
+            bench_sample(name, people, args.samples, args.seed)
+    elif args.command == "parallel":
+        print(f"{os.cpu_count()} CPUs")
+        for size in args.sizes:
+            bench_parallel(f"random {size}", random_pedigree(size, seed=args.seed), args.processes)
+    elif args.command == "enumerate":
+        pedigrees = [(filename, heredity.load_data(filename))
+                     for filename in ("data/family0.csv", "data/family1.csv", "data/family2.csv")]
+        pedigrees += [(f"random {size}", random_pedigree(size, seed=args.seed)) for size in args.sizes]
+        for name, people in pedigrees:
+            bench_enumerate(name, people)
+    elif args.command == "joint":
+        pedigrees = [(filename, heredity.load_data(filename))
+                     for filename in ("data/family0.csv", "data/family1.csv", "data/family2.csv")]
+        pedigrees += [(f"random {size}", random_pedigree(size, seed=args.seed)) for size in args.sizes]
+        for name, people in pedigrees:
+            bench_joint(name, people, args.assignments, args.seed)
+    elif args.command == "inference":
+        for filename in ("data/family0.csv", "data/family1.csv", "data/family2.csv"):
+            validate(filename, heredity.load_data(filename))
+        for size in args.validate:
+            validate(f"inbred {size}", random_pedigree(size, seed=args.seed, inbreeding=0.5))
+        for size in args.sizes:
+            bench_inference(f"random {size}", random_pedigree(size, seed=args.seed))
+
+
+def random_pedigree(n, seed=0, known=0.5, inbreeding=0.05):
+    """
+    Return `n` people in the form of heredity.load_data, each either a
+    founder or a child of an earlier couple, with each trait known with
+    probability `known`.
+
+    People find a spouse as they arrive, most often a founder who marries
+    into the family, but with probability `inbreeding` a relative, which
+    closes a loop in the pedigree.
+    """
+    rng = random.Random(seed)
+    people = {}
+    singles = []
+    couples = []
+
+    def add(mother, father):
+        name = f"Person{len(people)}"
+        trait = None
+        if rng.random() < known:
+            trait = rng.random() < 0.2
+        people[name] = {"name": name, "mother": mother, "father": father, "trait": trait}
+        return name
+
+    while len(people) < n:
+        mother = father = None
+        if couples and rng.random() < 0.7:
+            mother, father = rng.choice(couples)
+        person = add(mother, father)
+
+        if len(people) < n and rng.random() < 0.4:
+            if singles and rng.random() < inbreeding:
+                spouse = singles.pop(rng.randrange(len(singles)))
+            else:
+                spouse = add(None, None)
+            couples.append((person, spouse))
+        else:
+            singles.append(person)
+    return people
+
+
+def difference(probabilities, other):
+    """
+    Return the largest difference between two sets of probabilities.
+    """
+    return max(
+        abs(probabilities[person][field][value] - other[person][field][value])
+        for person in probabilities
+        for field in probabilities[person]
+        for value in probabilities[person][field]
+    )
+
+
+def validate(name, people):
+    """
+    Compare exact inference by elimination with enumeration on `people`.
+    """
+    start = time.perf_counter()
+    expected = heredity.enumerate_probabilities(people)
+    enumerated = time.perf_counter() - start
+
+    start = time.perf_counter()
+    probabilities = inference.marginals(people, heredity.PROBS)
+    eliminated = time.perf_counter() - start
+    print(f"{name}: {len(people)} people, enumeration {enumerated:.3f}s, "
+          f"elimination {eliminated:.4f}s, max difference {difference(probabilities, expected):.1e}")
+
+
+def random_assignments(people, n, seed=0):
+    """
+    Return `n` random (one_gene, two_genes, have_trait) sets of `people`.
+    """
+    rng = random.Random(seed)
+    assignments = []
+    for _ in range(n):
+        genes = {person: rng.choice((0, 1, 2)) for person in people}
+        assignments.append((
+            {person for person in people if genes[person] == 1},
+            {person for person in people if genes[person] == 2},
+            {person for person in people if rng.random() < 0.5}
+        ))
+    return assignments
+
+
+def bench_joint(name, people, n, seed=0):
+    """
+    Time the original joint_probability and the table-driven one on `n`
+    random assignments of `people`, checking that they agree exactly.
+    """
+    assignments = random_assignments(people, n, seed)
+
+    start = time.perf_counter()
+    expected = [legacy_joint_probability(people, *assignment) for assignment in assignments]
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = [heredity.joint_probability(people, *assignment) for assignment in assignments]
+    tabled = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(table, expected))
+    print(f"{name}: {len(people)} people, {n / legacy:,.0f} assignments/sec original, "
+          f"{n / tabled:,.0f} table ({legacy / tabled:.1f}x), {mismatches} mismatches")
+
+
+def bench_enumerate(name, people):
+    """
+    Time the original enumeration and the streaming one on `people`,
+    checking that they give exactly the same probabilities, and measure
+    the memory each takes at its peak.
+    """
+    results = []
+    for enumerate_probabilities in (legacy_enumerate_probabilities, heredity.enumerate_probabilities):
+        start = time.perf_counter()
+        probabilities = enumerate_probabilities(people)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        enumerate_probabilities(people)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results.append((probabilities, elapsed, peak))
+
+    (expected, legacy, legacy_peak), (probabilities, streamed, peak) = results
+    print(f"{name}: {len(people)} people, original {legacy:.3f}s {legacy_peak / 1024:,.0f} KiB, "
+          f"streaming {streamed:.3f}s {peak / 1024:,.0f} KiB ({legacy / streamed:.1f}x), "
+          f"{'identical' if probabilities == expected else 'DIFFERENT'}")
+
+
+def bench_parallel(name, people, processes):
+    """
+    Time enumeration of `people` in this process and in pools of each of
+    `processes` worker processes, checking that they agree.
+    """
+    start = time.perf_counter()
+    expected = heredity.enumerate_probabilities(people)
+    serial = time.perf_counter() - start
+    print(f"{name}: {len(people)} people, serial {serial:.3f}s")
+
+    for count in processes:
+        start = time.perf_counter()
+        probabilities = heredity.enumerate_probabilities(people, processes=count)
+        elapsed = time.perf_counter() - start
+        print(f"  {count} processes: {elapsed:.3f}s ({serial / elapsed:.2f}x), "
+              f"max difference {difference(probabilities, expected):.1e}")
+
+
+def bench_sample(name, people, budgets, seed=0):
+    """
+    Compare Gibbs sampling of `people` with each of `budgets` sweeps to
+    exact inference by elimination.
+    """
+    expected = inference.marginals(people, heredity.PROBS)
+    print(f"{name}: {len(people)} people")
+    for samples in budgets:
+        stats = {}
+        probabilities, errors = sampling.gibbs_marginals(
+            people, heredity.PROBS, samples=samples, seed=seed, stats=stats
+        )
+        largest = max(
+            error for person in errors for field in errors[person]
+            for error in errors[person][field].values()
+        )
+        print(f"  {samples} samples: {stats['seconds']:.2f}s "
+              f"({stats['samples_per_sec'] * len(people):,.0f} people/sec), "
+              f"max difference {difference(probabilities, expected):.4f}, "
+              f"max standard error {largest:.4f}")
+
+
+def bench_inference(name, people):
+    """
+    Time exact inference by elimination on `people`.
+    """
+    start = time.perf_counter()
+    inference.marginals(people, heredity.PROBS)
+    elapsed = time.perf_counter() - start
+    print(f"{name}: {len(people)} people, elimination {elapsed:.3f}s "
+          f"({elapsed / len(people) * 1e6:.0f} us per person)")
+
+
+def legacy_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    The original joint_probability of heredity.py, testing the sets for
+    every person and each of their parents.
+    """
+    j_probability = 1
+
+    for person in people:
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        
+        # Probability of NOT inheriting gene from BOTH parents ()
+        if person not in one_gene and person not in two_genes:    
+            # When person has no parents use distribution heredity.PROBS["gene"]
+            if not mother and not father:
+                j_probability *= heredity.PROBS["gene"][0]       
+            
+            # When person has parents each will pass one of their two genes on randomly
+            else:
+                # Mother has 0 genes
+                if mother not in one_gene and mother not in two_genes:
+                    # Father has 1 gene
+                    if father in one_gene:
+                        j_probability *= (1 - heredity.PROBS["mutation"]) * 0.50
+                    # Father has 2 genes
+                    elif father in two_genes:
+                        j_probability *= (1 - heredity.PROBS["mutation"]) * heredity.PROBS["mutation"]
+                    # Father has 0 genes
+                    else:
+                        j_probability *= (1 - heredity.PROBS["mutation"]) * (1 - heredity.PROBS["mutation"])
+
+                # Mother has 1 genes
+                if mother in one_gene:
+                    # Father has 1 gene
+                    if father in one_gene:
+                        j_probability *= 0.50 * 0.50
+                    # Father has 2 genes
+                    elif father in two_genes:
+                        j_probability *= 0.50 * heredity.PROBS["mutation"]
+                    # Father has 0 genes
+                    else:
+                        j_probability *= 0.50 * (1 - heredity.PROBS["mutation"])
+
+                # Mother has 2 genes
+                if mother in two_genes:
+                    # Father has 1 gene
+                    if father in one_gene:
+                        j_probability *= heredity.PROBS["mutation"] * 0.50
+                    # Father has 2 genes
+                    elif father in two_genes:
+                        j_probability *= heredity.PROBS["mutation"] * heredity.PROBS["mutation"]
+                    # Father has 0 genes
+                    else:
+                        j_probability *= heredity.PROBS["mutation"] * (1 -heredity.PROBS["mutation"])
+
+            # Check whether person is in have_trait and use probability distribution heredity.PROBS["trait"] (True/False)
+            j_probability *= heredity.PROBS["trait"][0][person in have_trait]
+
+        # Probability of inheriting gene from one parent OR other parent but not both
+        if person in one_gene:    
+            # When person has no parents use distribution heredity.PROBS["gene"]
+            if not mother and not father:
+                j_probability *= heredity.PROBS["gene"][1]       
+            
+            # When person has parents each will pass one of their two genes on randomly
+            else:
+                # Mother has 0 genes
+                if mother not in one_gene and mother not in two_genes:
+                    # Father has 1 gene
+                    if father in one_gene:
+                        j_probability *= heredity.PROBS["mutation"] * 0.50 + 0.50 * (1 - heredity.PROBS["mutation"]) 
+                    # Father has 2 genes
+                    elif father in two_genes:
+                        j_probability *= heredity.PROBS["mutation"] * heredity.PROBS["mutation"] + (1 - heredity.PROBS["mutation"]) * (1 - heredity.PROBS["mutation"])
+                    # Father has 0 genes
+                    else:
+                        j_probability *= heredity.PROBS["mutation"] * (1 - heredity.PROBS["mutation"]) + heredity.PROBS["mutation"] * (1 - heredity.PROBS["mutation"])
+
+                # Mother has 1 genes
+                if mother in one_gene:
+                    # Father has 1 gene
+                    if father in one_gene:
+                        j_probability *= 0.50 * 0.50 + 0.50 * 0.50
+                    # Father has 2 genes
+                    elif father in two_genes:
+                        j_probability *= 0.50 * heredity.PROBS["mutation"] + (1 - heredity.PROBS["mutation"]) * 0.50
+                    # Father has 0 genes
+                    else:
+                        j_probability *= 0.50 * (1 - heredity.PROBS["mutation"]) + heredity.PROBS["mutation"] * 0.50
+
+                # Mother has 2 genes
+                if mother in two_genes:
+                    # Father has 1 gene
+                    if father in one_gene:
+                        j_probability *= (1 - heredity.PROBS["mutation"]) * 0.50 + 0.50 * heredity.PROBS["mutation"]
+                    # Father has 2 genes
+                    elif father in two_genes:
+                        j_probability *= (1 - heredity.PROBS["mutation"]) * heredity.PROBS["mutation"] + (1 - heredity.PROBS["mutation"]) * heredity.PROBS["mutation"]
+                    # Father has 0 genes
+                    else:
+                        j_probability *= (1 - heredity.PROBS["mutation"]) * (1 - heredity.PROBS["mutation"]) + heredity.PROBS["mutation"] * heredity.PROBS["mutation"]
+
+            # Check whether person is in have_trait and use probability distribution heredity.PROBS["trait"] (True/False)
+            j_probability *= heredity.PROBS["trait"][1][person in have_trait]
+
+        # Probability of inheting gene from BOTH parents 
+        if person in two_genes:    
+            # When person has no parents use distribution heredity.PROBS["gene"]
+            if not mother and not father:
+                j_probability *= heredity.PROBS["gene"][2]       
+            
+            # When person has parents each will pass one of their two genes on randomly
+            else:
+                # Mother has 0 genes
+                if mother not in one_gene and mother not in two_genes:
+                    # Father has 1 gene
+                    if father in one_gene:
+                        j_probability *= heredity.PROBS["mutation"] * 0.50
+                    # Father has 2 genes
+                    elif father in two_genes:
+                        j_probability *= heredity.PROBS["mutation"] * (1 - heredity.PROBS["mutation"])
+                    # Father has 0 genes
+                    else:
+                        j_probability *= heredity.PROBS["mutation"] * heredity.PROBS["mutation"]
+
+                # Mother has 1 genes
+                if mother in one_gene:
+                    # Father has 1 gene
+                    if father in one_gene:
+                        j_probability *= 0.50 * 0.50
+                    # Father has 2 genes
+                    elif father in two_genes:
+                        j_probability *= 0.50 * (1 - heredity.PROBS["mutation"])
+                    # Father has 0 genes
+                    else:
+                        j_probability *= 0.50 * heredity.PROBS["mutation"]
+
+                # Mother has 2 genes
+                if mother in two_genes:
+                    # Father has 1 gene
+                    if father in one_gene:
+                        j_probability *= (1 - heredity.PROBS["mutation"]) * 0.50
+                    # Father has 2 genes
+                    elif father in two_genes:
+                        j_probability *= (1 - heredity.PROBS["mutation"]) * (1 - heredity.PROBS["mutation"])
+                    # Father has 0 genes
+                    else:
+                        j_probability *= (1 - heredity.PROBS["mutation"]) * heredity.PROBS["mutation"]
+
+            # Check whether person is in have_trait and use probability distribution heredity.PROBS["trait"] (True/False)
+            j_probability *= heredity.PROBS["trait"][2][person in have_trait]
+        
+    return j_probability
+
+
+def legacy_enumerate_probabilities(people):
+    """
+    The original enumeration of heredity.py, building the powersets of
+    one_gene and two_genes again for every set of traits and discarding
+    those that contradict the known traits.
+    """
+
+    # Keep track of gene and trait probabilities for each person
+    probabilities = {
+        person: {
+            "gene": {
+                2: 0,
+                1: 0,
+                0: 0
+            },
+            "trait": {
+                True: 0,
+                False: 0
+            }
+        }
+        for person in people
+    }
+    
+    # Loop over all sets of people who might have the trait
+    names = set(people)
+    for have_trait in heredity.powerset(names):
+
+        # Check if current set of people violates known information
+        fails_evidence = any(
+            (people[person]["trait"] is not None and
+             people[person]["trait"] != (person in have_trait))
+            for person in names
+        )
+        if fails_evidence:
+            continue
+
+        # Loop over all sets of people who might have the gene
+        for one_gene in heredity.powerset(names):
+            for two_genes in heredity.powerset(names - one_gene):
+
+                # Update probabilities with new joint probability
+                p = heredity.joint_probability(people, one_gene, two_genes, have_trait)
+                heredity.update(probabilities, one_gene, two_genes, have_trait, p)
+
+    # Ensure probabilities sum to 1
+    heredity.normalize(probabilities)
+    return probabilities
+
+
+if __name__ == "__main__":
+    main()
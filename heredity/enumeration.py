@@ -0,0 +1,196 @@
+import itertools
+from multiprocessing import Pool
+
+import inference
+
+
+# Sets of one_gene handed to a worker at a time
+CHUNK_SIZE = 64
+
+# Set in every worker process by start_worker
+family = None
+
+
+class Family():
+    """
+    The people of a pedigree compiled for enumerating assignments of genes
+    and traits to them as bitmasks, in which person i of `order`, a list
+    of everyone's names, is bit 1 << i.
+    """
+
+    def __init__(self, people, order, probs):
+        self.people = people
+        self.bit = {person: 1 << i for i, person in enumerate(order)}
+        self.bits = [self.bit[person] for person in order]
+        self.inherit = inference.flat_inheritance_table(probs)
+        self.unconditional = probs["gene"]
+        self.trait = probs["trait"]
+
+        # Everyone in the order of `people`, with the positions of their
+        # parents in it, where a missing parent is past the end and so is
+        # given no genes
+        index = {person: i for i, person in enumerate(people)}
+        self.members = [
+            (self.bit[person], index.get(people[person]["mother"], len(people)),
+             index.get(people[person]["father"], len(people)),
+             not people[person]["mother"] and not people[person]["father"])
+            for person in people
+        ]
+
+        # Everyone with a known trait has it fixed
+        self.known = sum(self.bit[person] for person in order if people[person]["trait"])
+        self.unknown = [self.bit[person] for person in order if people[person]["trait"] is None]
+
+    def sums(self):
+        """
+        Return empty sums of probability for every person's number of
+        genes and for whether they have the trait.
+        """
+        return [[0, 0, 0] for _ in self.members], [[0, 0] for _ in self.members]
+
+    def accumulate(self, assignments, genes, traits):
+        """
+        Add the joint probability of each of `assignments`, bitmasks of
+        (one_gene, two_genes, have_trait), to the sums `genes` and
+        `traits` of the number of genes and the trait each person has in
+        it. Each product is taken in the same order as joint_probability.
+        """
+        inherit = self.inherit
+        unconditional = self.unconditional
+        trait = self.trait
+        members = self.members
+
+        for one_gene, two_genes, have_trait in assignments:
+            counts = [1 if one_gene & person else 2 if two_genes & person else 0
+                      for person, _, _, _ in members]
+            counts.append(0)
+            p = 1
+            for (person, mother, father, founder), count in zip(members, counts):
+                if founder:
+                    p *= unconditional[count]
+                else:
+                    p *= inherit[counts[mother] * 3 + counts[father]][count]
+                p *= trait[count][bool(have_trait & person)]
+
+            for (person, _, _, _), count, gene_sums, trait_sums in zip(members, counts, genes, traits):
+                gene_sums[count] += p
+                trait_sums[bool(have_trait & person)] += p
+
+    def chunks(self, size=CHUNK_SIZE):
+        """
+        Yield the assignment space as (have_trait, one_genes) tasks, each
+        a set of traits agreeing with the known ones and a list of up to
+        `size` sets of one_gene to pair it with.
+        """
+        for have_trait in subsets(self.unknown):
+            one_genes = subsets(self.bits)
+            while chunk := list(itertools.islice(one_genes, size)):
+                yield self.known | have_trait, chunk
+
+    def chunk_assignments(self, have_trait, one_genes):
+        """
+        Yield every assignment of a chunk, each set of one_gene with every
+        set of two_genes among the rest.
+        """
+        for one_gene in one_genes:
+            rest = [bit for bit in self.bits if not bit & one_gene]
+            for two_genes in subsets(rest):
+                yield one_gene, two_genes, have_trait
+
+
+def assignments(people, names):
+    """
+    Yield every assignment of genes and traits to `names`, the set of
+    people in `people`, that agrees with the known traits.
+
+    Each is a tuple of bitmasks (one_gene, two_genes, have_trait) in which
+    person i of list(names) is bit 1 << i. People with a known trait have
+    it fixed rather than having every assignment to them generated and
+    then discarded. Otherwise the assignments come in the same order as
+    looping over powerset(names) for the traits, powerset(names) for
+    one_gene and powerset(names - one_gene) for two_genes.
+    """
+    order = list(names)
+    bit = {person: 1 << i for i, person in enumerate(order)}
+    known = sum(bit[person] for person in order if people[person]["trait"])
+    unknown = [bit[person] for person in order if people[person]["trait"] is None]
+
+    for have_trait in subsets(unknown):
+        for one_gene in subsets(order, bit):
+            # The rest are listed from a set of names, as powerset would,
+            # since their order is that of the set and not of `order`
+            chosen = {person for person in order if bit[person] & one_gene}
+            for two_genes in subsets(list(names - chosen), bit):
+                yield one_gene, two_genes, known | have_trait
+
+
+def subsets(items, bit=None):
+    """
+    Yield the bitmask of every subset of `items`, a list of bits, or of
+    names to look up in `bit`, in the same order as powerset.
+
+    Lexicographic order is kept when a fixed set of bits is added to every
+    subset, so subsets of the people of unknown trait come in the order
+    powerset gives the assignments that agree with the known traits.
+    """
+    if bit is not None:
+        items = [bit[item] for item in items]
+    for r in range(len(items) + 1):
+        for combination in itertools.combinations(items, r):
+            yield sum(combination)
+
+
+def enumerate_sums(people, probs):
+    """
+    Return the sums of the joint probability of every assignment that
+    agrees with the known traits, for each person's number of genes and
+    trait, as (genes, traits) lists in the order of `people`.
+
+    Assignments are summed in the order of the powerset loops, so the
+    sums are exactly theirs.
+    """
+    names = set(people)
+    family = Family(people, list(names), probs)
+    genes, traits = family.sums()
+    family.accumulate(assignments(people, names), genes, traits)
+    return genes, traits
+
+
+def start_worker(people, order, probs):
+    """
+    Compile the pedigree once in a worker process for every chunk it runs.
+    """
+    global family
+    family = Family(people, order, probs)
+
+
+def run_chunk(task):
+    """
+    Return the sums of the joint probabilities of a (have_trait,
+    one_genes) chunk of assignments.
+    """
+    genes, traits = family.sums()
+    family.accumulate(family.chunk_assignments(*task), genes, traits)
+    return genes, traits
+
+
+def parallel_enumerate_sums(people, probs, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Return the same sums as enumerate_sums, splitting the assignments into
+    chunks summed in a pool of `processes` worker processes.
+
+    Each worker keeps its own sums for a chunk, and these are added
+    together in the order of the chunks, so the result does not depend on
+    which worker finishes first. It can differ from enumerate_sums in the
+    last bits, as the additions are grouped differently.
+    """
+    order = list(people)
+    family = Family(people, order, probs)
+    genes, traits = family.sums()
+    with Pool(processes, initializer=start_worker, initargs=(people, order, probs)) as pool:
+        for chunk_genes, chunk_traits in pool.imap(run_chunk, family.chunks(chunk_size)):
+            for sums, partial in zip(genes, chunk_genes):
+                sums[:] = map(sum, zip(sums, partial))
+            for sums, partial in zip(traits, chunk_traits):
+                sums[:] = map(sum, zip(sums, partial))
+    return genes, traits
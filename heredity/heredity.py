@@ -1,6 +1,11 @@
+import argparse
 import csv
+import functools
 import itertools
-import sys
+
+import enumeration
+import inference
+import sampling
 
 PROBS = {
 
@@ -36,62 +41,93 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Ways of computing everyone's probabilities
+METHODS = ("enumerate", "eliminate", "sample")
+
+# Defaults for sampling
+SAMPLES = 10000
+CHAINS = 8
+
 
 def main():
+    parser = argparse.ArgumentParser(usage="python heredity.py data.csv [options]")
+    parser.add_argument("data")
+    parser.add_argument("--method", choices=METHODS, default="enumerate",
+                        help="enumerate every assignment, eliminate variables over the "
+                             "pedigree, or estimate by Gibbs sampling (default: enumerate)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="worker processes to enumerate in, 0 for one per CPU (default: 1)")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help=f"sweeps over everyone to sample in all (default: {SAMPLES})")
+    parser.add_argument("--chains", type=int, default=CHAINS,
+                        help=f"independent chains to sample, at least 2 (default: {CHAINS})")
+    parser.add_argument("--seed", type=int,
+                        help="seed the sampler for repeatable results")
+    args = parser.parse_args()
+    if args.method == "sample" and args.chains < 2:
+        parser.error("--chains must be at least 2 to estimate errors")
+    people = load_data(args.data)
+
+    errors = None
+    if args.method == "eliminate":
+        probabilities = inference.marginals(people, PROBS)
+    elif args.method == "sample":
+        probabilities, errors = sampling.gibbs_marginals(
+            people, PROBS, samples=args.samples, chains=args.chains, seed=args.seed
+        )
+    else:
+        probabilities = enumerate_probabilities(people, args.processes or None)
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    # Print results, with standard errors if sampled
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    print(f"    {value}: {p:.4f} ± {errors[person][field][value]:.4f}")
+
+
+def enumerate_probabilities(people, processes=1):
+    """
+    Return the gene and trait probabilities of everyone in `people` by
+    summing the joint probability of every assignment of genes and traits
+    that agrees with the known traits.
+
+    Assignments are streamed as bitmasks, so memory grows with the number
+    of people rather than the number of assignments. With one process
+    they are summed here, in the same order as looping over `powerset`,
+    and each joint probability is the same product as joint_probability,
+    so the sums are exactly those of the straightforward loop. Otherwise
+    they are split among `processes` worker processes, or one per CPU if
+    it is None.
+    """
+    if processes == 1:
+        genes, traits = enumeration.enumerate_sums(people, PROBS)
+    else:
+        genes, traits = enumeration.parallel_enumerate_sums(people, PROBS, processes)
 
-    # Keep track of gene and trait probabilities for each person
     probabilities = {
         person: {
             "gene": {
-                2: 0,
-                1: 0,
-                0: 0
+                2: gene_sums[2],
+                1: gene_sums[1],
+                0: gene_sums[0]
             },
             "trait": {
-                True: 0,
-                False: 0
+                True: trait_sums[True],
+                False: trait_sums[False]
             }
         }
-        for person in people
+        for person, gene_sums, trait_sums in zip(people, genes, traits)
     }
-    
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
@@ -139,156 +175,44 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
+    # Genes are found by a couple of set tests each and the probability
+    # of inheriting them looked up, rather than branching on every
+    # combination of the person's and parents' genes
+    inherit = inheritance(PROBS["mutation"])
+    unconditional = PROBS["gene"]
+    trait = PROBS["trait"]
+
     j_probability = 1
+    for person, data in people.items():
+        mother = data["mother"]
+        father = data["father"]
+        genes = 1 if person in one_gene else 2 if person in two_genes else 0
+
+        # When person has no parents use distribution PROBS["gene"],
+        # otherwise the chance of inheriting from parents with their genes
+        if not mother and not father:
+            j_probability *= unconditional[genes]
+        else:
+            j_probability *= inherit[
+                (1 if mother in one_gene else 2 if mother in two_genes else 0) * 3
+                + (1 if father in one_gene else 2 if father in two_genes else 0)
+            ][genes]
+
+        j_probability *= trait[genes][person in have_trait]
 
-    for person in people:
-        mother = people[person]["mother"]
-        father = people[person]["father"]
-        
-        # Probability of NOT inheriting gene from BOTH parents ()
-        if person not in one_gene and person not in two_genes:    
-            # When person has no parents use distribution PROBS["gene"]
-            if not mother and not father:
-                j_probability *= PROBS["gene"][0]       
-            
-            # When person has parents each will pass one of their two genes on randomly
-            else:
-                # Mother has 0 genes
-                if mother not in one_gene and mother not in two_genes:
-                    # Father has 1 gene
-                    if father in one_gene:
-                        j_probability *= (1 - PROBS["mutation"]) * 0.50
-                    # Father has 2 genes
-                    elif father in two_genes:
-                        j_probability *= (1 - PROBS["mutation"]) * PROBS["mutation"]
-                    # Father has 0 genes
-                    else:
-                        j_probability *= (1 - PROBS["mutation"]) * (1 - PROBS["mutation"])
-
-                # Mother has 1 genes
-                if mother in one_gene:
-                    # Father has 1 gene
-                    if father in one_gene:
-                        j_probability *= 0.50 * 0.50
-                    # Father has 2 genes
-                    elif father in two_genes:
-                        j_probability *= 0.50 * PROBS["mutation"]
-                    # Father has 0 genes
-                    else:
-                        j_probability *= 0.50 * (1 - PROBS["mutation"])
-
-                # Mother has 2 genes
-                if mother in two_genes:
-                    # Father has 1 gene
-                    if father in one_gene:
-                        j_probability *= PROBS["mutation"] * 0.50
-                    # Father has 2 genes
-                    elif father in two_genes:
-                        j_probability *= PROBS["mutation"] * PROBS["mutation"]
-                    # Father has 0 genes
-                    else:
-                        j_probability *= PROBS["mutation"] * (1 -PROBS["mutation"])
-
-            # Check whether person is in have_trait and use probability distribution PROBS["trait"] (True/False)
-            j_probability *= PROBS["trait"][0][person in have_trait]
-
-        # Probability of inheriting gene from one parent OR other parent but not both
-        if person in one_gene:    
-            # When person has no parents use distribution PROBS["gene"]
-            if not mother and not father:
-                j_probability *= PROBS["gene"][1]       
-            
-            # When person has parents each will pass one of their two genes on randomly
-            else:
-                # Mother has 0 genes
-                if mother not in one_gene and mother not in two_genes:
-                    # Father has 1 gene
-                    if father in one_gene:
-                        j_probability *= PROBS["mutation"] * 0.50 + 0.50 * (1 - PROBS["mutation"]) 
-                    # Father has 2 genes
-                    elif father in two_genes:
-                        j_probability *= PROBS["mutation"] * PROBS["mutation"] + (1 - PROBS["mutation"]) * (1 - PROBS["mutation"])
-                    # Father has 0 genes
-                    else:
-                        j_probability *= PROBS["mutation"] * (1 - PROBS["mutation"]) + PROBS["mutation"] * (1 - PROBS["mutation"])
-
-                # Mother has 1 genes
-                if mother in one_gene:
-                    # Father has 1 gene
-                    if father in one_gene:
-                        j_probability *= 0.50 * 0.50 + 0.50 * 0.50
-                    # Father has 2 genes
-                    elif father in two_genes:
-                        j_probability *= 0.50 * PROBS["mutation"] + (1 - PROBS["mutation"]) * 0.50
-                    # Father has 0 genes
-                    else:
-                        j_probability *= 0.50 * (1 - PROBS["mutation"]) + PROBS["mutation"] * 0.50
-
-                # Mother has 2 genes
-                if mother in two_genes:
-                    # Father has 1 gene
-                    if father in one_gene:
-                        j_probability *= (1 - PROBS["mutation"]) * 0.50 + 0.50 * PROBS["mutation"]
-                    # Father has 2 genes
-                    elif father in two_genes:
-                        j_probability *= (1 - PROBS["mutation"]) * PROBS["mutation"] + (1 - PROBS["mutation"]) * PROBS["mutation"]
-                    # Father has 0 genes
-                    else:
-                        j_probability *= (1 - PROBS["mutation"]) * (1 - PROBS["mutation"]) + PROBS["mutation"] * PROBS["mutation"]
-
-            # Check whether person is in have_trait and use probability distribution PROBS["trait"] (True/False)
-            j_probability *= PROBS["trait"][1][person in have_trait]
-
-        # Probability of inheting gene from BOTH parents 
-        if person in two_genes:    
-            # When person has no parents use distribution PROBS["gene"]
-            if not mother and not father:
-                j_probability *= PROBS["gene"][2]       
-            
-            # When person has parents each will pass one of their two genes on randomly
-            else:
-                # Mother has 0 genes
-                if mother not in one_gene and mother not in two_genes:
-                    # Father has 1 gene
-                    if father in one_gene:
-                        j_probability *= PROBS["mutation"] * 0.50
-                    # Father has 2 genes
-                    elif father in two_genes:
-                        j_probability *= PROBS["mutation"] * (1 - PROBS["mutation"])
-                    # Father has 0 genes
-                    else:
-                        j_probability *= PROBS["mutation"] * PROBS["mutation"]
-
-                # Mother has 1 genes
-                if mother in one_gene:
-                    # Father has 1 gene
-                    if father in one_gene:
-                        j_probability *= 0.50 * 0.50
-                    # Father has 2 genes
-                    elif father in two_genes:
-                        j_probability *= 0.50 * (1 - PROBS["mutation"])
-                    # Father has 0 genes
-                    else:
-                        j_probability *= 0.50 * PROBS["mutation"]
-
-                # Mother has 2 genes
-                if mother in two_genes:
-                    # Father has 1 gene
-                    if father in one_gene:
-                        j_probability *= (1 - PROBS["mutation"]) * 0.50
-                    # Father has 2 genes
-                    elif father in two_genes:
-                        j_probability *= (1 - PROBS["mutation"]) * (1 - PROBS["mutation"])
-                    # Father has 0 genes
-                    else:
-                        j_probability *= (1 - PROBS["mutation"]) * PROBS["mutation"]
-
-            # Check whether person is in have_trait and use probability distribution PROBS["trait"] (True/False)
-            j_probability *= PROBS["trait"][2][person in have_trait]
-        
     return j_probability
 
 
+@functools.lru_cache(maxsize=None)
+def inheritance(mutation):
+    """
+    Return the table of P(child genes | mother genes, father genes) for a
+    `mutation` probability, built once for each value, as a tuple indexed
+    by mother's genes * 3 + father's genes.
+    """
+    return inference.flat_inheritance_table({"mutation": mutation})
+
+
 def update(probabilities, one_gene, two_genes, have_trait, p):
     """
     Add to `probabilities` a new joint probability `p`.
@@ -0,0 +1,220 @@
+import heapq
+import itertools
+
+
+# Copies of the gene a person can have
+GENES = (0, 1, 2)
+
+
+def inheritance_table(probs):
+    """
+    Return P(child genes | mother genes, father genes) as a dictionary of
+    (mother, father) pairs to the probabilities of 0, 1 and 2 copies.
+
+    Each parent passes one copy independently: a parent with no copies
+    only through mutation, one with one copy half the time, and one with
+    two copies unless it mutates away. Every entry is the same product,
+    term for term, as in heredity.py's original joint_probability, so
+    the two agree to the last bit.
+    """
+    mutation = probs["mutation"]
+    passes = {0: mutation, 1: 0.50, 2: 1 - mutation}
+    keeps = {0: 1 - mutation, 1: 0.50, 2: mutation}
+    table = {}
+    for mother, father in itertools.product(GENES, repeat=2):
+        table[mother, father] = (
+            keeps[mother] * keeps[father],
+            passes[mother] * keeps[father] + keeps[mother] * passes[father],
+            passes[mother] * passes[father]
+        )
+    return table
+
+
+def flat_inheritance_table(probs):
+    """
+    Return inheritance_table as a tuple indexed by the mother's genes
+    times 3 plus the father's, for lookups without building a key.
+    """
+    table = inheritance_table(probs)
+    return tuple(table[pair] for pair in sorted(table))
+
+
+class Factor():
+    """
+    A table of non-negative values for every assignment of gene counts to
+    `variables`, a tuple of people, where `table` maps each tuple of gene
+    counts, in the order of `variables`, to its value.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = variables
+        self.table = table
+
+
+def multiply(factors):
+    """
+    Return the product of `factors` over the union of their variables.
+    """
+    variables = tuple(dict.fromkeys(
+        variable for factor in factors for variable in factor.variables
+    ))
+    positions = [
+        tuple(variables.index(variable) for variable in factor.variables)
+        for factor in factors
+    ]
+    table = {}
+    for genes in itertools.product(GENES, repeat=len(variables)):
+        value = 1.0
+        for factor, position in zip(factors, positions):
+            value *= factor.table[tuple(genes[i] for i in position)]
+        table[genes] = value
+    return Factor(variables, table)
+
+
+def marginalize(factor, keep):
+    """
+    Return `factor` summed over every variable not in `keep`, scaled to
+    sum to 1. Scaling leaves every normalized marginal as it was, and
+    stops products over large pedigrees from underflowing.
+    """
+    variables = tuple(variable for variable in factor.variables if variable in keep)
+    position = tuple(factor.variables.index(variable) for variable in variables)
+    table = dict.fromkeys(itertools.product(GENES, repeat=len(variables)), 0.0)
+    for genes, value in factor.table.items():
+        table[tuple(genes[i] for i in position)] += value
+    total = sum(table.values())
+    if total > 0:
+        for genes in table:
+            table[genes] /= total
+    return Factor(variables, table)
+
+
+def person_factor(people, person, probs, table):
+    """
+    Return the factor of `person`: the probability of their genes given
+    their parents' genes, or unconditionally for someone without parents,
+    times the probability of their trait if it is known.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    trait = people[person]["trait"]
+
+    def evidence(genes):
+        return 1.0 if trait is None else probs["trait"][genes][trait]
+
+    if not mother and not father:
+        return Factor((person,), {
+            (genes,): probs["gene"][genes] * evidence(genes) for genes in GENES
+        })
+    return Factor((person, mother, father), {
+        (genes, m, f): table[m, f][genes] * evidence(genes)
+        for genes, m, f in itertools.product(GENES, repeat=3)
+    })
+
+
+def elimination_order(factors):
+    """
+    Return an order in which to eliminate the variables of `factors`,
+    each time choosing the one with the fewest neighbours left, and the
+    neighbours each had when it was eliminated.
+
+    Two people are neighbours if they share a factor, so a child and both
+    parents are all neighbours. Eliminating a person connects all of their
+    remaining neighbours, as summing them out leaves a factor over them.
+    """
+    neighbours = {}
+    for factor in factors:
+        for variable in factor.variables:
+            neighbours.setdefault(variable, set()).update(factor.variables)
+    for variable in neighbours:
+        neighbours[variable].discard(variable)
+
+    # A heap of (neighbours, tie-break, person), where entries whose count
+    # is out of date are skipped as they come up
+    counter = itertools.count()
+    heap = [(len(adjacent), next(counter), variable) for variable, adjacent in neighbours.items()]
+    heapq.heapify(heap)
+    order = []
+    cliques = {}
+    while heap:
+        degree, _, variable = heapq.heappop(heap)
+        if variable in cliques or degree != len(neighbours[variable]):
+            continue
+        adjacent = neighbours.pop(variable)
+        order.append(variable)
+        cliques[variable] = adjacent
+        for other in adjacent:
+            neighbours[other].discard(variable)
+            neighbours[other].update(adjacent - {other})
+            heapq.heappush(heap, (len(neighbours[other]), next(counter), other))
+    return order, cliques
+
+
+def marginals(people, probs):
+    """
+    Return the probability of every number of genes and of the trait for
+    each person in `people`, given the known traits, computed exactly by
+    message passing over a junction tree of the pedigree.
+
+    Every person is a cluster of the tree, holding them and the neighbours
+    they had when eliminated, and is attached to the first of those
+    neighbours to be eliminated after them. One pass of messages up the
+    tree and one back down give every cluster the probability of its
+    genes, so the time taken grows linearly with the number of people for
+    pedigrees of bounded width. The result is in the same form as the
+    `probabilities` of heredity.py, normalized.
+    """
+    table = inheritance_table(probs)
+    factors = [person_factor(people, person, probs, table) for person in people]
+    order, cliques = elimination_order(factors)
+    position = {variable: i for i, variable in enumerate(order)}
+
+    # Each person's cluster is attached to their first neighbour eliminated
+    parent = {}
+    children = {variable: [] for variable in order}
+    for variable in order:
+        if cliques[variable]:
+            parent[variable] = min(cliques[variable], key=position.__getitem__)
+            children[parent[variable]].append(variable)
+
+    # Each factor belongs to the cluster of its first variable eliminated
+    potentials = {variable: [Factor((variable,), {(genes,): 1.0 for genes in GENES})]
+                  for variable in order}
+    for factor in factors:
+        potentials[min(factor.variables, key=position.__getitem__)].append(factor)
+
+    # Messages up the tree, children before parents, summing out the child
+    up = {}
+    for variable in order:
+        if variable in parent:
+            incoming = [up[child] for child in children[variable]]
+            up[variable] = marginalize(multiply(potentials[variable] + incoming), cliques[variable])
+
+    # Messages back down, parents before children, and each cluster's belief
+    down = {}
+    beliefs = {}
+    for variable in reversed(order):
+        incoming = [up[child] for child in children[variable]]
+        if variable in down:
+            incoming.append(down[variable])
+        beliefs[variable] = marginalize(multiply(potentials[variable] + incoming), {variable})
+        for child in children[variable]:
+            others = [message for message in incoming if message is not up[child]]
+            down[child] = marginalize(multiply(potentials[variable] + others), cliques[child])
+
+    probabilities = {}
+    for person in people:
+        genes = {count: beliefs[person].table[(count,)] for count in (2, 1, 0)}
+        trait = people[person]["trait"]
+        if trait is None:
+            has_trait = sum(p * probs["trait"][count][True] for count, p in genes.items())
+        else:
+            has_trait = float(trait)
+        probabilities[person] = {
+            "gene": genes,
+            "trait": {
+                True: has_trait,
+                False: 1 - has_trait
+            }
+        }
+    return probabilities
@@ -0,0 +1,173 @@
+import math
+import random
+import statistics
+import time
+
+import inference
+
+
+class Sampler():
+    """
+    The people of a pedigree compiled for Gibbs sampling their genes given
+    the known traits, with person i being `names[i]`.
+
+    Each person's genes are redrawn in turn from their distribution given
+    everyone else's: the chance of their genes given their parents', or
+    PROBS["gene"] for someone without parents, times the chance of their
+    trait if it is known, times the chance of each child's genes given
+    theirs and the other parent's.
+    """
+
+    def __init__(self, people, probs):
+        self.names = list(people)
+        index = {name: i for i, name in enumerate(self.names)}
+        self.inherit = inference.flat_inheritance_table(probs)
+
+        # For each person, their parents' positions or None, the
+        # unconditional chance of their genes if they have no parents, the
+        # chance of their trait given their genes, and their children as
+        # (child, other parent, whether they are the mother)
+        self.parents = []
+        self.priors = []
+        self.evidence = []
+        self.children = [[] for _ in self.names]
+        for i, name in enumerate(self.names):
+            mother = people[name]["mother"]
+            father = people[name]["father"]
+            trait = people[name]["trait"]
+            if not mother and not father:
+                self.parents.append(None)
+                self.priors.append(tuple(probs["gene"][genes] for genes in inference.GENES))
+            else:
+                m, f = index[mother], index[father]
+                self.parents.append((m, f))
+                self.priors.append(None)
+                self.children[m].append((i, f, True))
+                self.children[f].append((i, m, False))
+            self.evidence.append(tuple(
+                1.0 if trait is None else probs["trait"][genes][trait]
+                for genes in inference.GENES
+            ))
+
+    def conditional(self, i, genes):
+        """
+        Return the weights of person i having 0, 1 and 2 copies of the
+        gene given everyone else's `genes`.
+        """
+        inherit = self.inherit
+        parents = self.parents[i]
+        if parents is None:
+            weights = list(self.priors[i])
+        else:
+            weights = list(inherit[genes[parents[0]] * 3 + genes[parents[1]]])
+        for count in inference.GENES:
+            weights[count] *= self.evidence[i][count]
+        for child, other, mother in self.children[i]:
+            child_genes = genes[child]
+            other_genes = genes[other] if mother else genes[other] * 3
+            step = 3 if mother else 1
+            for count in inference.GENES:
+                weights[count] *= inherit[count * step + other_genes][child_genes]
+        return weights
+
+    def chain(self, sweeps, burn_in, rng):
+        """
+        Run one chain of `burn_in` sweeps then `sweeps` more over everyone,
+        drawing with `rng`, and return each person's average chance of 0,
+        1 and 2 copies of the gene over the later sweeps.
+
+        Averaging the distribution each person is drawn from, rather than
+        counting the draws, gives the same mean with less variance.
+        """
+        n = len(self.names)
+        genes = [0] * n
+        totals = [[0.0, 0.0, 0.0] for _ in range(n)]
+        for sweep in range(burn_in + sweeps):
+            keep = sweep >= burn_in
+            for i in range(n):
+                w0, w1, w2 = self.conditional(i, genes)
+                total = w0 + w1 + w2
+                r = rng.random() * total
+                genes[i] = 0 if r < w0 else 1 if r < w0 + w1 else 2
+                if keep:
+                    row = totals[i]
+                    row[0] += w0 / total
+                    row[1] += w1 / total
+                    row[2] += w2 / total
+        return [[value / sweeps for value in row] for row in totals]
+
+
+def gibbs_marginals(people, probs, samples=10000, chains=8, burn_in=0.1, seed=None, stats=None):
+    """
+    Estimate the probability of every number of genes and of the trait
+    for each person in `people`, given the known traits, by Gibbs
+    sampling.
+
+    The budget of `samples` sweeps over everyone is split between
+    `chains` independent chains, each seeded from `seed` and discarding
+    its first `burn_in` fraction of sweeps. Each chain gives one estimate,
+    so the spread between chains gives every probability a standard
+    error.
+
+    Return (probabilities, errors), both in the form of the
+    `probabilities` of heredity.py. If `stats` is a dictionary, it is
+    updated with the sweeps and chains run and the time taken.
+    """
+    if chains < 2:
+        raise ValueError("at least two chains are needed to estimate errors")
+    sweeps = max(1, samples // chains)
+    discard = int(sweeps * burn_in)
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+
+    start = time.perf_counter()
+    sampler = Sampler(people, probs)
+    estimates = [
+        sampler.chain(sweeps, discard, random.Random(f"{seed}/{chain}"))
+        for chain in range(chains)
+    ]
+    seconds = time.perf_counter() - start
+
+    probabilities = {}
+    errors = {}
+    for i, person in enumerate(sampler.names):
+        genes = {count: [estimate[i][count] for estimate in estimates] for count in (2, 1, 0)}
+
+        # An unknown trait's chance is averaged over the genes
+        trait = people[person]["trait"]
+        if trait is None:
+            has_trait = [
+                sum(estimate[i][count] * probs["trait"][count][True] for count in inference.GENES)
+                for estimate in estimates
+            ]
+        else:
+            has_trait = [float(trait)] * chains
+
+        probabilities[person] = {
+            "gene": {count: statistics.fmean(values) for count, values in genes.items()},
+            "trait": {
+                True: statistics.fmean(has_trait),
+                False: 1 - statistics.fmean(has_trait)
+            }
+        }
+        trait_error = statistics.stdev(has_trait) / math.sqrt(chains)
+        errors[person] = {
+            "gene": {
+                count: statistics.stdev(values) / math.sqrt(chains)
+                for count, values in genes.items()
+            },
+            "trait": {
+                True: trait_error,
+                False: trait_error
+            }
+        }
+
+    if stats is not None:
+        stats.update({
+            "samples": sweeps * chains,
+            "chains": chains,
+            "burn_in": discard,
+            "seconds": seconds,
+            "samples_per_sec": sweeps * chains / seconds if seconds else 0.0
+        })
+    return probabilities, errors
@@ -0,0 +1,664 @@
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from statistics import NormalDist
+
+import incremental
+import pagerank
+from linkgraph import LinkGraph, power_iteration
+from transitions import TransitionCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for pagerank.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    iterate = commands.add_parser("iterate", help="compare iterate_pagerank with the dict version")
+    iterate.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    iterate.add_argument("--links", type=int, default=8,
+                         help="average links per page (default: 8)")
+    iterate.add_argument("--legacy-limit", type=int, default=2000,
+                         help="largest corpus to run the dict version on (default: 2000)")
+    iterate.add_argument("--seed", type=int, default=0)
+
+    sample = commands.add_parser("sample", help="compare sample_pagerank with the original sampler")
+    sample.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 1000000])
+    sample.add_argument("--links", type=int, default=8,
+                        help="average links per page (default: 8)")
+    sample.add_argument("--samples", type=int, default=10 ** 6)
+    sample.add_argument("--legacy-samples", type=int, default=10 ** 4,
+                        help="samples to time the original sampler on (default: 10000)")
+    sample.add_argument("--seed", type=int, default=0)
+
+    walkers = commands.add_parser("walkers", help="measure parallel sampling throughput per core")
+    walkers.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    walkers.add_argument("--links", type=int, default=8,
+                         help="average links per page (default: 8)")
+    walkers.add_argument("--samples", type=int, default=4 * 10 ** 6)
+    walkers.add_argument("--walkers", type=int, default=pagerank.WALKERS)
+    walkers.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4],
+                         help="pool sizes to compare (default: 1 2 4)")
+    walkers.add_argument("--seed", type=int, default=0)
+
+    crawl = commands.add_parser("crawl", help="compare crawl with the original one")
+    crawl.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000])
+    crawl.add_argument("--links", type=int, default=8,
+                       help="average links per page (default: 8)")
+    crawl.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16],
+                       help="thread pool sizes to compare (default: 1 4 16)")
+    crawl.add_argument("--seed", type=int, default=0)
+
+    update = commands.add_parser("incremental", help="time incremental updates after small edits")
+    update.add_argument("--sizes", type=int, nargs="+", default=[1000, 20000])
+    update.add_argument("--links", type=int, default=8,
+                        help="average links per page (default: 8)")
+    update.add_argument("--edits", type=int, nargs="+", default=[1, 10, 100],
+                        help="numbers of pages to relink between updates (default: 1 10 100)")
+    update.add_argument("--seed", type=int, default=0)
+
+    graph = commands.add_parser("graph", help="compare the crawl dictionary with a link graph file")
+    graph.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    graph.add_argument("--links", type=int, default=8,
+                       help="average links per page (default: 8)")
+    graph.add_argument("--samples", type=int, default=10 ** 6)
+    graph.add_argument("--seed", type=int, default=0)
+
+    personalized = commands.add_parser("personalized",
+                                       help="compare batched personalized PageRank with a loop")
+    personalized.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    personalized.add_argument("--links", type=int, default=8,
+                              help="average links per page (default: 8)")
+    personalized.add_argument("--batches", type=int, nargs="+", default=[8, 32, 128],
+                              help="numbers of teleport vectors to solve (default: 8 32 128)")
+    personalized.add_argument("--seeds", type=int, default=3,
+                              help="pages in each seed set (default: 3)")
+    personalized.add_argument("--seed", type=int, default=0)
+
+    transitions = commands.add_parser("transitions", help="time cached transition models")
+    transitions.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    transitions.add_argument("--links", type=int, default=8,
+                             help="average links per page (default: 8)")
+    transitions.add_argument("--calls", type=int, default=2000,
+                             help="models to request, following a random surfer (default: 2000)")
+    transitions.add_argument("--maxsize", type=int, default=4096,
+                             help="entries in the transition cache (default: 4096)")
+    transitions.add_argument("--seed", type=int, default=0)
+
+    suite = commands.add_parser("suite", help="time every stage on generated corpora and save JSON")
+    suite.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000],
+                       help="pages per corpus, up to 1000000 (default: 100 1000 10000 100000)")
+    suite.add_argument("--kinds", choices=GENERATORS, nargs="+", default=list(GENERATORS))
+    suite.add_argument("--links", type=int, default=8,
+                       help="average links per page (default: 8)")
+    suite.add_argument("--self-links", type=float, default=0.01,
+                       help="fraction of linking pages that also link to themselves (default: 0.01)")
+    suite.add_argument("--samples", type=int, default=10 ** 6)
+    suite.add_argument("--output", default="benchmark-results.json",
+                       help="where to save the results (default: benchmark-results.json)")
+    suite.add_argument("--baseline", help="results saved by an earlier run to compare against")
+    suite.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "suite":
+        run_suite(args)
+    elif args.command == "transitions":
+        for size in args.sizes:
+            corpus = random_corpus(size, args.links, seed=args.seed)
+            bench_transitions(f"random {size}", corpus, args.calls, args.maxsize, args.seed)
+    elif args.command == "personalized":
+        for size in args.sizes:
+            corpus = random_corpus(size, args.links, seed=args.seed)
+            bench_personalized(f"random {size}", corpus, args.batches, args.seeds, args.seed)
+    elif args.command == "graph":
+        for size in args.sizes:
+            bench_graph(f"random {size}", size, args.links, args.samples, args.seed)
+    elif args.command == "incremental":
+        for size in args.sizes:
+            corpus = random_corpus(size, args.links, seed=args.seed)
+            with tempfile.TemporaryDirectory() as directory:
+                write_corpus(directory, corpus)
+                bench_incremental(f"random {size}", directory, corpus, args.edits, args.seed)
+    elif args.command == "crawl":
+        for size in args.sizes:
+            corpus = random_corpus(size, args.links, seed=args.seed)
+            with tempfile.TemporaryDirectory() as directory:
+                write_corpus(directory, corpus)
+                bench_crawl(f"random {size}", directory, args.workers)
+    elif args.command == "walkers":
+        for size in args.sizes:
+            corpus = random_corpus(size, args.links, seed=args.seed)
+            bench_walkers(f"random {size}", corpus, args.samples, args.walkers,
+                          args.processes, args.seed)
+    elif args.command == "sample":
+        for size in args.sizes:
+            corpus = random_corpus(size, args.links, seed=args.seed)
+            bench_sample(f"random {size}", corpus, args.samples, args.legacy_samples)
+    elif args.command == "iterate":
+        for corpus in ("corpus0", "corpus1", "corpus2"):
+            bench_iterate(corpus, pagerank.crawl(corpus), True)
+        for size in args.sizes:
+            corpus = random_corpus(size, args.links, seed=args.seed)
+            bench_iterate(f"random {size}", corpus, size <= args.legacy_limit)
+
+
+def random_corpus(n, links, seed=0, self_links=0.0):
+    """
+    Return a corpus dictionary of `n` pages, each linking to about
+    `links` others chosen uniformly, with one page in ten dangling. A
+    fraction `self_links` of the linking pages also link to themselves,
+    which crawl drops.
+    """
+    rng = random.Random(seed)
+    pages = [f"{i}.html" for i in range(n)]
+    corpus = {}
+    for page in pages:
+        if rng.random() < 0.1:
+            corpus[page] = set()
+        else:
+            corpus[page] = set(rng.choices(pages, k=rng.randint(1, 2 * links - 1))) - {page}
+            if self_links and rng.random() < self_links:
+                corpus[page].add(page)
+    return corpus
+
+
+def scale_free_corpus(n, links, seed=0, self_links=0.0):
+    """
+    Return a corpus dictionary of `n` pages, each linking to about `links`
+    others, with one page in ten dangling. Pages are added one at a time
+    and mostly link to earlier pages by preferential attachment, chosen in
+    proportion to one plus the links to them so far, giving a few hubs
+    and a long tail; one link in five goes to any page, so that there are
+    cycles. A fraction `self_links` of the linking pages also link to
+    themselves.
+    """
+    rng = random.Random(seed)
+    pages = [f"{i}.html" for i in range(n)]
+
+    # Each earlier page once, then once more for each link to it, so that
+    # drawing from `chosen` uniformly is drawing in proportion to in-degree + 1
+    chosen = []
+    corpus = {}
+    for page in pages:
+        targets = set()
+        if rng.random() >= 0.1:
+            for _ in range(rng.randint(1, 2 * links - 1)):
+                if chosen and rng.random() < 0.8:
+                    targets.add(chosen[int(rng.random() * len(chosen))])
+                else:
+                    targets.add(pages[int(rng.random() * n)])
+            targets.discard(page)
+            if self_links and rng.random() < self_links:
+                targets.add(page)
+            chosen.extend(sorted(targets))
+        chosen.append(page)
+        corpus[page] = targets
+    return corpus
+
+
+# Corpus generators for the benchmark suite
+GENERATORS = {
+    "random": random_corpus,
+    "scale-free": scale_free_corpus
+}
+
+
+def write_corpus(directory, corpus):
+    """
+    Write `corpus` to `directory` as one HTML file per page.
+    """
+    for page, links in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html lang=\"en\">\n<head><title>{page}</title></head>\n<body>\n")
+            f.write(f"<h1>{page}</h1>\n")
+            for link in sorted(links):
+                f.write(f"<div>Links to <a href=\"{link}\">{link}</a></div>\n")
+            f.write("</body>\n</html>\n")
+
+
+def legacy_crawl(directory):
+    """
+    The original crawl, kept as a baseline: it reads every file whole, one
+    at a time.
+    """
+    pages = dict()
+    for filename in os.listdir(directory):
+        if not filename.endswith(".html"):
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            contents = f.read()
+            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
+            pages[filename] = set(links) - {filename}
+    for filename in pages:
+        pages[filename] = set(
+            link for link in pages[filename]
+            if link in pages
+        )
+    return pages
+
+
+def legacy_iterate_pagerank(corpus, damping_factor):
+    """
+    The original dict-based iterate_pagerank, kept as a baseline: it
+    deep-copies the ranks every round and scans every page's links for
+    every target page.
+    """
+    pagerank = {}
+    for page in corpus:
+        pagerank[page] = 1 / len(corpus)
+
+    has_converged = False
+    while has_converged != True:
+        current_pagerank = copy.deepcopy(pagerank)
+        rank_difference = {}
+        for page in corpus.keys():
+            rank = 0
+            for page_i, links in corpus.items():
+                if page in links:
+                    rank += current_pagerank[page_i] / len(links)
+                if len(links) == 0:
+                    rank += 1 / len(corpus)
+            pagerank[page] = ((1 - damping_factor) / len(corpus)) + (damping_factor * rank)
+            rank_difference[page] = abs(current_pagerank[page] - pagerank[page])
+        for page in rank_difference:
+            if rank_difference[page] <= 0.001:
+                has_converged = True
+
+    total_rank = 0
+    for rank in pagerank.values():
+        total_rank += rank
+    for page in pagerank:
+        pagerank[page] = pagerank[page] / total_rank
+    return pagerank
+
+
+def legacy_transition_model(corpus, page, damping_factor):
+    """
+    The original transition_model, kept as a baseline: it builds a
+    dictionary of every page, recounting the corpus for every entry.
+    """
+    model = {}
+    links = corpus[page]
+    if len(links) == 0:
+        for key in corpus.keys():
+            model[key] = 1 / len(corpus.keys())
+        return model
+    for link in links:
+        model[link] = 1 / len(links) * damping_factor
+    for key in corpus.keys():
+        if key not in model.keys():
+            model[key] = 1 / len(corpus) * (1 - damping_factor)
+        else:
+            model[key] += 1 / len(corpus) * (1 - damping_factor)
+    return model
+
+
+def legacy_sample_pagerank(corpus, damping_factor, n):
+    """
+    The original sampler, kept as a baseline: every step builds the full
+    transition model and draws from it with random.choices.
+    """
+    counts = {}
+    page = random.choice(list(corpus))
+    for i in range(n):
+        model = legacy_transition_model(corpus, page, damping_factor)
+        next_page = random.choices(list(model.keys()), weights=list(model.values()), k=1)[0]
+        if next_page not in counts:
+            counts[next_page] = 1
+        else:
+            counts[next_page] += 1
+        page = next_page
+    for page in counts:
+        counts[page] /= n
+    return counts
+
+
+def run_suite(args):
+    """
+    Run bench_corpus for every kind and size of corpus in `args`, save the
+    results as JSON to `args.output`, and compare every stage with the
+    results in `args.baseline`, if given.
+    """
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            for result in json.load(f)["results"]:
+                baseline[result["kind"], result["pages"]] = result
+
+    results = []
+    for kind in args.kinds:
+        for size in args.sizes:
+            result = bench_corpus(kind, size, args.links, args.self_links, args.samples, args.seed)
+            results.append(result)
+            print_result(result, baseline.get((kind, size)))
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "damping": pagerank.DAMPING,
+            "links": args.links,
+            "self_links": args.self_links,
+            "samples": args.samples,
+            "seed": args.seed,
+            "results": results
+        }, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+
+def bench_corpus(kind, size, links, self_links, n, seed=0):
+    """
+    Generate a corpus of `size` pages of `kind`, write it out as HTML, and
+    time crawling it, building and saving its link graph, iterating, and
+    taking `n` samples. Return a dictionary of the timings and of how far
+    the sampled ranks are from the iterated ones.
+    """
+    stages = {}
+
+    start = time.perf_counter()
+    corpus = GENERATORS[kind](size, links, seed=seed, self_links=self_links)
+    stages["generate"] = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        pages = os.path.join(directory, "pages")
+        os.mkdir(pages)
+        start = time.perf_counter()
+        write_corpus(pages, corpus)
+        stages["write"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        crawled = pagerank.crawl(pages)
+        stages["crawl"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        graph = LinkGraph.from_corpus(crawled)
+        stages["graph"] = time.perf_counter() - start
+
+        path = os.path.join(directory, "corpus.graph")
+        start = time.perf_counter()
+        graph.save(path)
+        stages["save"] = time.perf_counter() - start
+        graph_bytes = os.path.getsize(path)
+
+        start = time.perf_counter()
+        graph = LinkGraph.load(path)
+        stages["load"] = time.perf_counter() - start
+
+        residuals = []
+        start = time.perf_counter()
+        exact = pagerank.iterate_pagerank(graph, pagerank.DAMPING, residuals=residuals)
+        stages["iterate"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sampled = pagerank.sample_pagerank(graph, pagerank.DAMPING, n)
+        stages["sample"] = time.perf_counter() - start
+
+    errors = [abs(sampled[page] - exact[page]) for page in exact]
+    return {
+        "kind": kind,
+        "pages": size,
+        "links": sum(len(links) for links in crawled.values()),
+        "dangling": len(graph.dangling),
+        "self_links": sum(page in links for page, links in corpus.items()),
+        "crawl_matches": crawled == {page: links - {page} for page, links in corpus.items()},
+        "graph_bytes": graph_bytes,
+        "iterations": len(residuals),
+        "samples": n,
+        "stages": stages,
+        "pages_per_sec": size / stages["crawl"],
+        "samples_per_sec": n / stages["sample"],
+        "max_error": max(errors),
+        "l1_error": sum(errors)
+    }
+
+
+def print_result(result, baseline=None):
+    """
+    Print one result of bench_corpus, with the ratio of each stage's time
+    to its time in `baseline` if given.
+    """
+    print(f"{result['kind']} {result['pages']}: {result['links']} links, "
+          f"{result['dangling']} dangling, {result['self_links']} self-links")
+    for stage, seconds in result["stages"].items():
+        line = f"  {stage:>9}: {seconds:9.3f}s"
+        if baseline and baseline["stages"].get(stage):
+            line += f"  ({seconds / baseline['stages'][stage]:.2f}x baseline)"
+        print(line)
+    matches = "matches" if result["crawl_matches"] else "DOES NOT MATCH"
+    print(f"  crawl {matches} the generated links, {result['iterations']} iterations, "
+          f"sampled ranks within {result['max_error']:.2e} (L1 {result['l1_error']:.2e})")
+
+
+def bench_sample(name, corpus, n, legacy_n):
+    """
+    Time `n` steps of sample_pagerank and `legacy_n` steps of the
+    original sampler on `corpus`, reporting samples per second, and the
+    largest difference of the sampled ranks from the iterated ones.
+    """
+    print(f"{name}: {len(corpus)} pages")
+
+    start = time.perf_counter()
+    ranks = pagerank.sample_pagerank(corpus, pagerank.DAMPING, n)
+    elapsed = time.perf_counter() - start
+    exact = pagerank.iterate_pagerank(corpus, pagerank.DAMPING)
+    error = max(abs(ranks[page] - exact[page]) for page in corpus)
+    print(f"  {'O(1) step':>10}: {n / elapsed:12.0f} samples/sec, max error {error:.4f}")
+
+    if legacy_n:
+        start = time.perf_counter()
+        legacy_sample_pagerank(corpus, pagerank.DAMPING, legacy_n)
+        elapsed = time.perf_counter() - start
+        print(f"  {'original':>10}: {legacy_n / elapsed:12.0f} samples/sec")
+
+
+def bench_walkers(name, corpus, n, walkers, processes, seed=0):
+    """
+    Time parallel_sample_pagerank on `corpus` with each pool size in
+    `processes`, reporting samples per second per core, the widest
+    confidence interval, and how often the iterated ranks fall inside
+    the intervals.
+    """
+    print(f"{name}: {len(corpus)} pages")
+    exact = pagerank.iterate_pagerank(corpus, pagerank.DAMPING)
+    z = NormalDist().inv_cdf((1 + pagerank.CONFIDENCE) / 2)
+
+    for count in processes:
+        stats = {}
+        ranks, errors = pagerank.parallel_sample_pagerank(
+            corpus, pagerank.DAMPING, n, walkers=walkers, processes=count, seed=seed, stats=stats
+        )
+        covered = sum(abs(ranks[page] - exact[page]) <= z * errors[page] for page in corpus)
+        print(f"  {count:>2} processes: {stats['samples_per_sec']:10.0f} samples/sec, "
+              f"{stats['samples_per_core_sec']:10.0f} per core, "
+              f"widest interval {stats['max_interval']:.4f}, "
+              f"{covered / len(corpus):.1%} cover the iterated rank")
+
+
+def bench_crawl(name, directory, workers):
+    """
+    Time the original crawl of `directory`, then crawl with every thread
+    pool size in `workers` and with a process pool, reporting pages per
+    second and checking the results match.
+    """
+    start = time.perf_counter()
+    expected = legacy_crawl(directory)
+    elapsed = time.perf_counter() - start
+    print(f"{name}: {len(expected)} pages")
+    print(f"  {'original':>12}: {len(expected) / elapsed:10.0f} pages/sec")
+
+    runs = [(f"{count} threads", count, False) for count in workers]
+    runs.append(("processes", None, True))
+    for label, count, processes in runs:
+        stats = {}
+        pages = pagerank.crawl(directory, workers=count, processes=processes, stats=stats)
+        same = "same" if pages == expected else "DIFFERENT"
+        print(f"  {label:>12}: {stats['pages_per_sec']:10.0f} pages/sec, {same} links")
+
+
+def bench_incremental(name, directory, corpus, edits, seed=0):
+    """
+    Rank the corpus written to `directory` from scratch, then relink each
+    number of pages in `edits` in turn and update the saved ranks,
+    reporting rounds of iteration and time against a full recomputation.
+    """
+    rng = random.Random(seed)
+    pages = sorted(corpus)
+    state = os.path.join(directory, "pagerank.state")
+    print(f"{name}: {len(corpus)} pages")
+
+    stats = {}
+    incremental.update_pagerank(directory, pagerank.DAMPING, state, stats=stats)
+    print(f"  {'first run':>10}: {stats['iterations']:4} iterations, {stats['seconds']:8.3f}s")
+
+    for count in edits:
+        for page in rng.sample(pages, count):
+            corpus[page] = set(rng.sample(pages, len(corpus[page]) or 1)) - {page}
+            write_corpus(directory, {page: corpus[page]})
+
+        stats = {}
+        ranks, _ = incremental.update_pagerank(directory, pagerank.DAMPING, state, stats=stats)
+        residuals = []
+        start = time.perf_counter()
+        exact = pagerank.iterate_pagerank(pagerank.crawl(directory, workers=1), pagerank.DAMPING,
+                                          residuals=residuals)
+        elapsed = time.perf_counter() - start
+        difference = max(abs(ranks[page] - exact[page]) for page in corpus)
+        print(f"  {count:>4} edits: {stats['iterations']:4} iterations, {stats['seconds']:8.3f}s; "
+              f"from scratch {len(residuals):4} iterations, {elapsed:8.3f}s; "
+              f"max difference {difference:.2e}")
+
+
+def bench_graph(name, size, links, n, seed=0):
+    """
+    Compare the memory held by a crawl dictionary of `size` pages with
+    the size of its link graph file, then time mapping the file and
+    ranking straight from it.
+    """
+    tracemalloc.start()
+    corpus = random_corpus(size, links, seed=seed)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{name}: {len(corpus)} pages, crawl dictionary holds {held / 2 ** 20:.1f} MiB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "corpus.graph")
+        start = time.perf_counter()
+        LinkGraph.from_corpus(corpus).save(path)
+        elapsed = time.perf_counter() - start
+        print(f"  {'save':>8}: {elapsed:8.3f}s, {os.path.getsize(path) / 2 ** 20:.1f} MiB on disk")
+
+        start = time.perf_counter()
+        graph = LinkGraph.load(path)
+        print(f"  {'load':>8}: {time.perf_counter() - start:8.3f}s")
+
+        for label, solve in (("iterate", pagerank.iterate_pagerank),
+                             ("sample", lambda graph, damping: pagerank.sample_pagerank(graph, damping, n))):
+            start = time.perf_counter()
+            solve(graph, pagerank.DAMPING)
+            mapped = time.perf_counter() - start
+            start = time.perf_counter()
+            solve(corpus, pagerank.DAMPING)
+            print(f"  {label:>8}: {mapped:8.3f}s from the file, "
+                  f"{time.perf_counter() - start:8.3f}s from the dictionary")
+
+
+def bench_personalized(name, corpus, batches, seeds, seed=0):
+    """
+    Time personalized_pagerank on each number in `batches` of random seed
+    sets of `seeds` pages, against power_iteration solving them one at a
+    time, reporting
+    the largest difference between the two.
+    """
+    rng = random.Random(seed)
+    graph = LinkGraph.from_corpus(corpus)
+    print(f"{name}: {len(corpus)} pages")
+
+    for count in batches:
+        teleports = [rng.sample(graph.pages, seeds) for _ in range(count)]
+        start = time.perf_counter()
+        batch = pagerank.personalized_pagerank(graph, pagerank.DAMPING, teleports)
+        batched = time.perf_counter() - start
+
+        # The scalar solver, once per seed set
+        index = {page: i for i, page in enumerate(graph.pages)}
+        start = time.perf_counter()
+        loop = [
+            power_iteration(graph, pagerank.DAMPING, teleport={index[page]: 1 for page in teleport})
+            for teleport in teleports
+        ]
+        looped = time.perf_counter() - start
+        difference = max(
+            abs(ranks[page] - other[i] / sum(other))
+            for ranks, other in zip(batch, loop) for i, page in enumerate(graph.pages)
+        )
+        print(f"  {count:>4} vectors: batched {batched:8.3f}s, one at a time {looped:8.3f}s "
+              f"({looped / batched:.1f}x), max difference {difference:.1e}")
+
+
+def bench_transitions(name, corpus, calls, maxsize, seed=0):
+    """
+    Request the transition models of `calls` pages along a random walk of
+    `corpus`, timing the original transition_model, the current one with
+    and without a TransitionCache, and check that the dictionaries all
+    match.
+    """
+    rng = random.Random(seed)
+    pages = list(corpus)
+    walk = []
+    page = rng.choice(pages)
+    for _ in range(calls):
+        walk.append(page)
+        links = list(corpus[page])
+        page = rng.choice(links) if links and rng.random() < pagerank.DAMPING else rng.choice(pages)
+    print(f"{name}: {len(corpus)} pages, {calls} models")
+
+    cache = TransitionCache(corpus, maxsize)
+    runs = [
+        ("original", lambda page: legacy_transition_model(corpus, page, pagerank.DAMPING)),
+        ("uncached", lambda page: pagerank.transition_model(corpus, page, pagerank.DAMPING)),
+        ("cached", lambda page: pagerank.transition_model(corpus, page, pagerank.DAMPING, cache))
+    ]
+    expected = [legacy_transition_model(corpus, page, pagerank.DAMPING) for page in walk[:20]]
+    for label, model in runs:
+        start = time.perf_counter()
+        for page in walk:
+            model(page)
+        elapsed = time.perf_counter() - start
+        if label in ("uncached", "cached"):
+            same = "same" if [model(page) for page in walk[:20]] == expected else "DIFFERENT"
+            note = f", {same} models"
+        else:
+            note = ""
+        print(f"  {label:>9}: {calls / elapsed:12.0f} models/sec{note}")
+    print(f"  cache hit ratio {cache.stats()['hit_ratio']:.1%}")
+
+
+def bench_iterate(name, corpus, legacy=True):
+    """
+    Time iterate_pagerank on `corpus`, and the original dict version too
+    if `legacy` is true, reporting the largest difference between them.
+    """
+    links = sum(len(links) for links in corpus.values())
+    print(f"{name}: {len(corpus)} pages, {links} links")
+
+    start = time.perf_counter()
+    ranks = pagerank.iterate_pagerank(corpus, pagerank.DAMPING)
+    print(f"  {'sparse':>8}: {time.perf_counter() - start:8.3f}s")
+
+    if legacy:
+        start = time.perf_counter()
+        old_ranks = legacy_iterate_pagerank(corpus, pagerank.DAMPING)
+        elapsed = time.perf_counter() - start
+        difference = max(abs(ranks[page] - old_ranks[page]) for page in corpus)
+        print(f"  {'dict':>8}: {elapsed:8.3f}s, max difference {difference:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+
+# Links are the href of <a> tags, as in the original crawl
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Text at the end of a chunk that could still grow into a LINK: a "<",
+# "<a", an open tag that has not yet closed, or an unterminated href
+PARTIAL = re.compile(r"<(?:a(?:\s[^>]*|\s[^>]*?href=\"[^\"]*)?)?\Z")
+
+# Files are read this many characters at a time
+CHUNK_SIZE = 1 << 20
+
+# Pages are handed to the pool this many at a time
+BATCH_SIZE = 64
+
+
+def read_links(path, chunk_size=CHUNK_SIZE):
+    """
+    Return the set of links in the HTML file at `path`, reading it
+    `chunk_size` characters at a time.
+
+    A link split across two chunks is found by carrying the unfinished
+    tail of each chunk over to the start of the next.
+    """
+    links = set()
+    carry = ""
+    with open(path) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            text = carry + chunk
+
+            # A short read is the end of the file, so nothing is carried
+            if len(chunk) < chunk_size:
+                links.update(LINK.findall(text))
+                return links
+
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+            unfinished = PARTIAL.search(text, end)
+            carry = text[unfinished.start():] if unfinished else ""
+
+
+def parse(directory, filenames, chunk_size=CHUNK_SIZE):
+    """
+    Return a list of (filename, links) for a batch of pages of `directory`.
+    """
+    return [
+        (filename, read_links(os.path.join(directory, filename), chunk_size) - {filename})
+        for filename in filenames
+    ]
+
+
+def batches(entries, size=BATCH_SIZE):
+    """
+    Yield lists of up to `size` names of the .html files among `entries`.
+    """
+    batch = []
+    for entry in entries:
+        if entry.name.endswith(".html"):
+            batch.append(entry.name)
+            if len(batch) == size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def crawl(directory, workers=None, processes=False, chunk_size=CHUNK_SIZE, stats=None):
+    """
+    Return a dictionary mapping each .html page of `directory` to the set
+    of other pages in the corpus that it links to.
+
+    Batches of pages are read and parsed by a pool of `workers` threads,
+    which suits files that are slow to read, or by a pool of worker
+    processes if `processes` is true, which suits pages that are slow to
+    parse. With a single worker, pages are read in this thread. If
+    `stats` is a dictionary, it is updated with the number of pages and
+    the pages parsed per second.
+    """
+    start = time.perf_counter()
+    pages = dict()
+
+    read = partial(parse, directory, chunk_size=chunk_size)
+    with os.scandir(directory) as entries:
+        if workers == 1:
+            for batch in map(read, batches(entries)):
+                pages.update(batch)
+        else:
+            # Batches are handed to the pool as the directory is listed
+            executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            with executor(workers) as pool:
+                futures = [pool.submit(read, batch) for batch in batches(entries)]
+                for future in futures:
+                    pages.update(future.result())
+
+    # Only include links to other pages in the corpus
+    for filename in pages:
+        pages[filename] = set(
+            link for link in pages[filename]
+            if link in pages
+        )
+
+    if stats is not None:
+        seconds = time.perf_counter() - start
+        stats.update({
+            "pages": len(pages),
+            "seconds": seconds,
+            "pages_per_sec": len(pages) / seconds if seconds else 0.0
+        })
+    return pages
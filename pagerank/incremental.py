@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import time
+
+from crawler import read_links
+from linkgraph import LinkGraph, power_iteration
+
+
+# Bumped whenever the layout of the state file changes
+STATE_VERSION = 1
+
+
+def file_hash(path):
+    """
+    Return a hex digest of the contents of the file at `path`.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_state(path):
+    """
+    Return the state saved at `path` by update_pagerank, or None if there
+    is none or it was written by another version.
+    """
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("version") != STATE_VERSION:
+        return None
+    return state
+
+
+def save_state(path, state):
+    """
+    Write `state` to `path`, replacing any previous state in one step so
+    an interrupted run leaves the old one intact.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        # dumps encodes in C, where dump would stream through Python
+        f.write(json.dumps(state))
+    os.replace(temporary, path)
+
+
+def scan(directory, previous):
+    """
+    Compare the .html pages of `directory` with `previous`, the files
+    recorded by the last update, and return (files, changes).
+
+    A page whose modification time and size are unchanged is not read
+    again. Otherwise its contents are hashed, and only parsed for links if
+    the hash differs. `files` maps each page to its record, and `changes`
+    lists the pages added, removed and changed.
+    """
+    files = {}
+    changes = {"added": [], "removed": [], "changed": [], "unchanged": 0}
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".html"):
+                continue
+            stat = entry.stat()
+            old = previous.get(entry.name)
+            if old and old["mtime_ns"] == stat.st_mtime_ns and old["size"] == stat.st_size:
+                files[entry.name] = old
+                changes["unchanged"] += 1
+                continue
+
+            digest = file_hash(entry.path)
+            if old and old["hash"] == digest:
+                # Touched but not edited
+                links = old["links"]
+                changes["unchanged"] += 1
+            else:
+                links = sorted(read_links(entry.path) - {entry.name})
+                changes["changed" if old else "added"].append(entry.name)
+            files[entry.name] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "hash": digest,
+                "links": links
+            }
+
+    changes["removed"] = [page for page in previous if page not in files]
+    return files, changes
+
+
+def update_pagerank(directory, damping_factor, path, tolerance=1e-6, max_iterations=1000,
+                    norm="l1", residuals=None, stats=None):
+    """
+    Return (ranks, graph): PageRank values for each page of `directory`,
+    updating the ranks saved at `path` by the previous run instead of
+    starting over, and the LinkGraph of the pages they were ranked on.
+
+    Only added and changed pages are parsed, and power iteration starts
+    from the previous ranks, with new pages starting at the rank of a page
+    nobody links to, so a small change converges in a few rounds. If
+    nothing changed, the saved ranks are returned without iterating. The
+    new link graph and ranks are saved back to `path`.
+
+    If `stats` is a dictionary, it is updated with the number of pages
+    added, removed, changed and unchanged, and the rounds of iteration.
+
+    Raises ValueError if `directory` has no pages to rank.
+    """
+    start = time.perf_counter()
+    state = load_state(path) or {}
+    files, changes = scan(directory, state.get("files", {}))
+    if not files:
+        raise ValueError(f"no pages in {directory}")
+    corpus = {
+        page: set(link for link in record["links"] if link in files)
+        for page, record in files.items()
+    }
+    graph = LinkGraph.from_corpus(corpus)
+    n = len(graph)
+
+    previous = state.get("ranks", {})
+    rounds = []
+    if (not changes["added"] and not changes["removed"] and not changes["changed"]
+            and state.get("damping") == damping_factor and state.get("norm") == norm
+            and state.get("tolerance") is not None and state["tolerance"] <= tolerance):
+        ranks = [previous[page] for page in graph.pages]
+        reached = state["tolerance"]
+    else:
+        guess = [previous.get(page, (1 - damping_factor) / n) for page in graph.pages]
+        total = sum(guess)
+        ranks = power_iteration(
+            graph, damping_factor, tolerance=tolerance, max_iterations=max_iterations,
+            norm=norm, residuals=rounds, start=[rank / total for rank in guess]
+        )
+        total = sum(ranks)
+        ranks = [rank / total for rank in ranks]
+        reached = tolerance if not rounds or rounds[-1] <= tolerance else None
+    if residuals is not None:
+        residuals.extend(rounds)
+
+    pagerank = dict(zip(graph.pages, ranks))
+    save_state(path, {
+        "version": STATE_VERSION,
+        "damping": damping_factor,
+        "norm": norm,
+        # The tolerance the saved ranks converged to, if they did
+        "tolerance": reached,
+        "files": files,
+        "ranks": pagerank
+    })
+
+    if stats is not None:
+        stats.update({
+            "added": len(changes["added"]),
+            "removed": len(changes["removed"]),
+            "changed": len(changes["changed"]),
+            "unchanged": changes["unchanged"],
+            "iterations": len(rounds),
+            "seconds": time.perf_counter() - start
+        })
+    return pagerank, graph
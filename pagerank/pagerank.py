@@ -1,55 +1,170 @@
+import argparse
 import os
 import random
-import re
 import sys
-import copy
+from statistics import NormalDist
+
+import crawler
+import incremental
+from linkgraph import NORMS, LinkGraph, batch_power_iteration, power_iteration
+from sampler import sample_walkers, walk
+from transitions import Transition
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Iteration stops once the rank vector moves by at most TOLERANCE in NORM,
+# or after MAX_ITERATIONS rounds
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+NORM = "l1"
+
+# Independent walkers sample in rounds, each round running WALKERS of them,
+# and report every rank with a CONFIDENCE interval
+WALKERS = 8
+ROUNDS = 10
+CONFIDENCE = 0.95
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
-    print(f"PageRank Results from Iteration")
+    parser = argparse.ArgumentParser(usage="python pagerank.py corpus [options]")
+    parser.add_argument("corpus", help="a directory of HTML pages, or a link graph file")
+    parser.add_argument("--save-graph", metavar="FILE",
+                        help="save the link graph to FILE, to be ranked later without crawling")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help=f"stop iterating once ranks move by at most this much (default: {TOLERANCE})")
+    parser.add_argument("--max-iterations", type=int, default=MAX_ITERATIONS,
+                        help=f"stop iterating after this many rounds (default: {MAX_ITERATIONS})")
+    parser.add_argument("--norm", choices=NORMS, default=NORM,
+                        help=f"how to measure the change in ranks (default: {NORM})")
+    parser.add_argument("--residuals", action="store_true",
+                        help="print the change in ranks after every round")
+    parser.add_argument("--crawl-workers", type=int,
+                        help="threads or processes reading pages (default: chosen by the pool)")
+    parser.add_argument("--crawl-processes", action="store_true",
+                        help="parse pages in worker processes instead of threads")
+    parser.add_argument("--crawl-stats", action="store_true",
+                        help="report how long the crawl took")
+    parser.add_argument("--incremental", metavar="STATE",
+                        help="update the ranks saved in STATE by the last run instead of starting over")
+    parser.add_argument("--personalize", metavar="PAGE[,PAGE...]", action="append",
+                        help="also rank with teleports to just these pages; may be repeated")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help=f"random surfer steps to sample (default: {SAMPLES})")
+    parser.add_argument("--walkers", type=int, default=0,
+                        help="sample with this many independent walkers per round and report errors")
+    parser.add_argument("--processes", type=int,
+                        help="worker processes for the walkers (default: one per core)")
+    parser.add_argument("--seed", type=int,
+                        help="seed the sampler for repeatable results")
+    parser.add_argument("--target-error", type=float,
+                        help="stop sampling once every interval is within this much of its estimate")
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE,
+                        help=f"confidence level of the reported intervals (default: {CONFIDENCE})")
+    args = parser.parse_args()
+    if args.walkers < 0 or args.walkers == 1:
+        parser.error("--walkers must be at least 2 to estimate errors")
+
+    residuals = []
+    if os.path.isfile(args.corpus):
+        # A link graph file saved by --save-graph needs no crawl
+        if args.incremental:
+            parser.error("--incremental needs a directory of pages")
+        corpus = LinkGraph.load(args.corpus)
+    elif args.incremental:
+        # Only pages added or changed since the last run are read
+        update_stats = {}
+        try:
+            iterated, corpus = incremental.update_pagerank(
+                args.corpus, DAMPING, args.incremental, tolerance=args.tolerance,
+                max_iterations=args.max_iterations, norm=args.norm, residuals=residuals,
+                stats=update_stats
+            )
+        except ValueError as e:
+            sys.exit(e)
+        if args.crawl_stats:
+            print(f"Read {update_stats['added'] + update_stats['changed']} of {len(corpus)} pages "
+                  f"in {update_stats['seconds']:.3f}s")
+    else:
+        crawl_stats = {}
+        corpus = crawl(args.corpus, workers=args.crawl_workers, processes=args.crawl_processes,
+                       stats=crawl_stats)
+        if args.crawl_stats:
+            print(f"Crawled {crawl_stats['pages']} pages in {crawl_stats['seconds']:.3f}s "
+                  f"({crawl_stats['pages_per_sec']:.0f} pages/sec)")
+        corpus = LinkGraph.from_corpus(corpus)
+    if args.save_graph:
+        corpus.save(args.save_graph)
+
+    if args.walkers:
+        stats = {}
+        ranks, errors = parallel_sample_pagerank(
+            corpus, DAMPING, args.samples, walkers=args.walkers, processes=args.processes,
+            seed=args.seed, target_error=args.target_error, confidence=args.confidence,
+            stats=stats
+        )
+        print(f"PageRank Results from Sampling (n = {stats['samples']}, "
+              f"{stats['walkers']} walkers, {args.confidence:.0%} intervals)")
+        z = NormalDist().inv_cdf((1 + args.confidence) / 2)
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f} ± {z * errors[page]:.4f}")
+        print(f"  {stats['samples_per_core_sec']:.0f} samples/sec per core "
+              f"on {stats['processes']} processes")
+    else:
+        if args.seed is not None:
+            random.seed(args.seed)
+        ranks = sample_pagerank(corpus, DAMPING, args.samples)
+        print(f"PageRank Results from Sampling (n = {args.samples})")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+    if args.incremental:
+        ranks = iterated
+        print(f"PageRank Results from Iteration ({update_stats['added']} added, "
+              f"{update_stats['removed']} removed, {update_stats['changed']} changed, "
+              f"{update_stats['iterations']} iterations)")
+    else:
+        ranks = iterate_pagerank(
+            corpus, DAMPING, tolerance=args.tolerance, max_iterations=args.max_iterations,
+            norm=args.norm, residuals=residuals
+        )
+        print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-
-
-def crawl(directory):
+    if args.personalize:
+        seeds = [pages.split(",") for pages in args.personalize]
+        try:
+            batch = personalized_pagerank(
+                corpus, DAMPING, seeds, tolerance=args.tolerance,
+                max_iterations=args.max_iterations, norm=args.norm
+            )
+        except ValueError as e:
+            sys.exit(e)
+        for pages, ranks in zip(args.personalize, batch):
+            print(f"Personalized PageRank Results ({pages})")
+            for page in sorted(ranks):
+                print(f"  {page}: {ranks[page]:.4f}")
+    if args.residuals:
+        print(f"Residuals ({args.norm})")
+        for i, residual in enumerate(residuals, 1):
+            print(f"  {i}: {residual:.3e}")
+    if residuals and residuals[-1] > args.tolerance:
+        print(f"Not converged after {len(residuals)} iterations.")
+
+
+def crawl(directory, workers=None, processes=False, stats=None):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
-    """
-    pages = dict()
-
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
 
-    return pages
+    Pages are read concurrently by `workers` threads, or worker processes
+    if `processes` is true. If `stats` is a dictionary, it is updated with
+    the number of pages crawled and the pages per second.
+    """
+    return crawler.crawl(directory, workers=workers, processes=processes, stats=stats)
 
 
-def transition_model(corpus, page, damping_factor):
+def transition_model(corpus, page, damping_factor, cache=None):
     """
     Return a probability distribution over which page to visit next,
     given a current page.
@@ -57,116 +172,142 @@ def transition_model(corpus, page, damping_factor):
     With probability `damping_factor`, choose a link at random
     linked to by `page`. With probability `1 - damping_factor`, choose
     a link at random chosen from all pages in the corpus.
-    """
-    
-    model = {}
-    links = corpus[page]
 
-    # If page has no outgoing links, return a model (probability distribution) 
-    # that chooses randomly among all pages with equal probability.
-    if len(links) == 0:
-        for key in corpus.keys():
-            model[key] = 1 / len(corpus.keys())
-        return model
-
-    # Populate a model where a random surfer will randomicaly choose from 
-    # current page links with damping_factor probability, and choose from 
-    # all pages in corpus with (1 - damping_factor) probability.
-    for link in links:
-        model[link] = 1 / len(links) * damping_factor
-
-    for key in corpus.keys():
-        if key not in model.keys():
-            model[key] = 1 / len(corpus) * (1 - damping_factor)
-        else:
-            model[key] += 1 / len(corpus) * (1 - damping_factor)
-
-    return model
+    If `cache` is a TransitionCache of `corpus`, the compact model of
+    `page` is looked up there instead of being rebuilt from its links.
+    """
+    if cache is not None:
+        transition = cache.get(page, damping_factor)
+    else:
+        transition = Transition.build(corpus, page, damping_factor)
+    return transition.distribution(corpus)
 
 
 def sample_pagerank(corpus, damping_factor, n):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
+    `corpus` is a crawl dictionary or a LinkGraph.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    pagerank = {}
+    graph = link_graph(corpus)
+
+    # Generate n sample pages, starting at a random one, and count each visit
+    counts = walk(graph, damping_factor, n, random.random)
 
-    # Choose a random page to be the starting page
-    page = random.choice(list(corpus))
-    
-    # Loop to generate n sample pages and 
-    for i in range(n):
-        model = transition_model(corpus, page, damping_factor)
-        next_page = random.choices(list(model.keys()), weights=list(model.values()), k=1)[0]
-        
-        if next_page not in pagerank:
-            pagerank[next_page] = 1
-        else:
-            pagerank[next_page] += 1
-
-        page = next_page
-    
     # Divide each page count by number of samples to obtain the probability
-    for page in pagerank:
-        pagerank[page] /= n 
+    pagerank = {}
+    for page, count in zip(graph.pages, counts):
+        pagerank[page] = count / n
 
     return pagerank
 
 
-def iterate_pagerank(corpus, damping_factor):
+def parallel_sample_pagerank(corpus, damping_factor, n, walkers=WALKERS, rounds=ROUNDS,
+                             processes=None, seed=None, target_error=None,
+                             confidence=CONFIDENCE, stats=None):
+    """
+    Return PageRank values for each page from about `n` samples taken by
+    independent random walkers spread over `processes` worker processes.
+    `corpus` is a crawl dictionary or a LinkGraph.
+
+    Return a pair of dictionaries keyed by page name: the estimated
+    PageRank values, and the standard error of each estimate. Sampling
+    stops early once every page's `confidence` interval is within
+    `target_error` of its estimate. If `stats` is a dictionary, it is
+    updated with the samples taken and the throughput per core.
+    """
+    graph = link_graph(corpus)
+    ranks, errors, run = sample_walkers(
+        graph, damping_factor, n, walkers=walkers, rounds=rounds, processes=processes,
+        seed=seed, target_error=target_error, confidence=confidence
+    )
+    if stats is not None:
+        stats.update(run)
+    return dict(zip(graph.pages, ranks)), dict(zip(graph.pages, errors))
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     max_iterations=MAX_ITERATIONS, norm=NORM, residuals=None):
     """
     Return PageRank values for each page by iteratively updating
-    PageRank values until convergence.
+    PageRank values until convergence. `corpus` is a crawl dictionary
+    or a LinkGraph.
+
+    Iteration has converged once the whole rank vector moves by at most
+    `tolerance`, measured by `norm` ("l1" or "linf"), and gives up after
+    `max_iterations` rounds. If `residuals` is a list, the change after
+    every round is appended to it.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    pagerank = {}
+    # Solve on a compressed link graph, where every round costs time
+    # proportional to the number of pages plus links
+    graph = link_graph(corpus)
+    ranks = power_iteration(
+        graph, damping_factor, tolerance=tolerance, max_iterations=max_iterations,
+        norm=norm, residuals=residuals
+    )
+
+    # Normalize ranks (divide each rank by total rank) to guarantee that
+    # they sum up to 1 despite rounding.
+    total_rank = sum(ranks)
 
-    # Set the initial pagerank of every page to 1 / N (equally likely to be on any page). 
-    for page in corpus:
-        pagerank[page] = 1 / len(corpus)
-        
-    has_converged = False
-    while has_converged != True:
-        current_pagerank = copy.deepcopy(pagerank)
-        rank_difference = {}
-
-        for page in corpus.keys():
-            rank = 0
-            # Find summation of PR(i) / NumLinks(i) for each page
-            for page_i, links in corpus.items():
-                if page in links:
-                    rank += current_pagerank[page_i] / len(links)
-                
-                if len(links) == 0:
-                    rank += 1 / len(corpus)
-
-            # 
-            pagerank[page] = ((1 - damping_factor) / len(corpus)) + (damping_factor * rank)
-            
-            rank_difference[page] = abs(current_pagerank[page] - pagerank[page])
-            
-        for page in rank_difference:
-            if rank_difference[page] <= 0.001:
-                has_converged = True
-
-    # Normalize ranks (divide each rank by total rank) to guarantee that 
-    # they sum up to 1 in case they already are not (i.e: corpus2).     
-    total_rank = 0    
-    for rank in pagerank.values():
-        total_rank += rank
-
-    for page in pagerank:
-        pagerank[page] = pagerank[page] / total_rank
+    pagerank = {}
+    for page, rank in zip(graph.pages, ranks):
+        pagerank[page] = rank / total_rank
 
     return pagerank
 
 
+def personalized_pagerank(corpus, damping_factor, teleports, tolerance=TOLERANCE,
+                          max_iterations=MAX_ITERATIONS, norm=NORM, residuals=None):
+    """
+    Return personalized PageRank values for each of `teleports`, solving
+    them all together. `corpus` is a crawl dictionary or a LinkGraph.
+
+    Each teleport distribution is a dictionary mapping page names to
+    weights, or a collection of page names weighted equally: instead of
+    jumping to any page, the surfer jumps to those pages in proportion to
+    their weights. Iteration stops once every distribution has converged.
+
+    Return a list with a dictionary of PageRank values per teleport
+    distribution, each summing to 1.
+    """
+    graph = link_graph(corpus)
+    index = {page: i for i, page in enumerate(graph.pages)}
+    batch = []
+    for teleport in teleports:
+        if not isinstance(teleport, dict):
+            teleport = dict.fromkeys(teleport, 1)
+        try:
+            batch.append({index[page]: weight for page, weight in teleport.items()})
+        except KeyError as e:
+            raise ValueError(f"teleport page {e} is not in the corpus") from None
+
+    results = []
+    for ranks in batch_power_iteration(
+        graph, damping_factor, batch, tolerance=tolerance, max_iterations=max_iterations,
+        norm=norm, residuals=residuals
+    ):
+        total_rank = sum(ranks)
+        results.append({page: rank / total_rank for page, rank in zip(graph.pages, ranks)})
+    return results
+
+
+def link_graph(corpus):
+    """
+    Return `corpus` as a LinkGraph, compressing a crawl dictionary.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    return LinkGraph.from_corpus(corpus)
+
+
 if __name__ == "__main__":
     main()
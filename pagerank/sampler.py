@@ -0,0 +1,151 @@
+import array
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+from operator import add, mul
+from statistics import NormalDist
+
+
+from linkgraph import LinkGraph
+
+
+# Set in every worker process by start_worker
+graph = None
+damping = None
+
+
+def walk(graph, damping_factor, n, uniform):
+    """
+    Take `n` steps of the random surfer over the LinkGraph `graph`,
+    starting at a random page. `uniform` draws floats in [0, 1).
+
+    Return an array counting the visits to every page.
+    """
+    # Every step follows the transition model without building it: with
+    # probability `damping_factor` follow one of the page's links, and
+    # otherwise (or from a page without links) jump to any page. A page's
+    # links are a slice of `targets`, which makes a step O(1).
+    offsets = graph.out_offsets
+    targets = graph.targets
+    size = len(graph)
+    counts = array.array("q", bytes(8 * size))
+    page = int(uniform() * size)
+    for _ in range(n):
+        first = offsets[page]
+        degree = offsets[page + 1] - first
+        if degree and uniform() < damping_factor:
+            page = targets[first + int(uniform() * degree)]
+        else:
+            page = int(uniform() * size)
+        counts[page] += 1
+    return counts
+
+
+def start_worker(source, damping_factor):
+    """
+    Keep the link graph in a worker process for every walker it runs,
+    mapping it from its file if `source` is a path.
+    """
+    global graph, damping
+    graph = LinkGraph.load(source) if isinstance(source, str) else source
+    damping = damping_factor
+
+
+def run_walker(task):
+    """
+    Run one walker of `steps` samples seeded with `seed`, from a
+    (seed, steps) pair, and return its visit counts.
+    """
+    seed, steps = task
+    return walk(graph, damping, steps, random.Random(seed).random)
+
+
+def sample_walkers(link_graph, damping_factor, n, walkers=8, rounds=10,
+                   processes=None, seed=None, target_error=None, confidence=0.95):
+    """
+    Estimate PageRank from about `n` samples taken by independent walkers
+    over `link_graph` in a pool of `processes` worker processes. Workers
+    map a graph that was loaded from a file themselves rather than being
+    sent a copy.
+
+    Sampling runs in up to `rounds` rounds of `walkers` walkers each, every
+    walker starting afresh at a random page with its own seed derived from
+    `seed`. Each walker's visit frequencies are one estimate of the ranks,
+    so the spread between walkers gives every page a standard error. If
+    `target_error` is given, sampling stops after the first round in which
+    every page's `confidence` interval is within `target_error` of its
+    estimate.
+
+    Return (ranks, errors, stats) where ranks and errors are lists indexed
+    by page and stats is a dictionary describing the run.
+    """
+    if walkers < 2:
+        raise ValueError("at least two walkers are needed to estimate errors")
+    if rounds < 1:
+        raise ValueError("at least one round of walkers is needed")
+    steps = max(1, n // (walkers * rounds))
+    processes = processes or os.cpu_count() or 1
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    # Running sums of every walker's counts and of their squares
+    totals = [0] * len(link_graph)
+    squares = [0] * len(link_graph)
+    batches = 0
+    errors = None
+
+    start = time.perf_counter()
+    if processes == 1:
+        start_worker(link_graph, damping_factor)
+        pool = None
+        run = map
+    else:
+        source = link_graph.path or link_graph
+        pool = Pool(processes, initializer=start_worker, initargs=(source, damping_factor))
+        run = pool.imap_unordered
+    try:
+        for i in range(rounds):
+            tasks = [(f"{seed}/{i}/{walker}", steps) for walker in range(walkers)]
+            for counts in run(run_walker, tasks):
+                totals = list(map(add, totals, counts))
+                squares = list(map(add, squares, map(mul, counts, counts)))
+                batches += 1
+
+            errors = standard_errors(totals, squares, batches, steps)
+            if target_error is not None and z * max(errors) <= target_error:
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    seconds = time.perf_counter() - start
+
+    samples = batches * steps
+    ranks = [total / samples for total in totals]
+    stats = {
+        "samples": samples,
+        "walkers": batches,
+        "rounds": i + 1,
+        "processes": processes,
+        "seconds": seconds,
+        "samples_per_sec": samples / seconds,
+        "samples_per_core_sec": samples / seconds / processes,
+        "max_interval": z * max(errors)
+    }
+    return ranks, errors, stats
+
+
+def standard_errors(totals, squares, batches, steps):
+    """
+    Return the standard error of every page's mean visit frequency over
+    `batches` walkers of `steps` samples, from the sums of their visit
+    counts and of the squared counts.
+    """
+    errors = []
+    for total, square in zip(totals, squares):
+        variance = (square - total * total / batches) / (batches - 1)
+        errors.append(math.sqrt(max(variance, 0.0) / batches) / steps)
+    return errors
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+
+
+class Transition():
+    """
+    The transition model from one page, kept as the page's links and two
+    probabilities instead of a probability for every page in the corpus.
+
+    The surfer moves to each page in `links` with probability `follow`,
+    and to any page at all, linked or not, with probability `teleport`,
+    so a linked page's probability is `follow + teleport`. A page without
+    links has a `follow` of 0 and a `teleport` of 1 / N.
+    """
+
+    __slots__ = ("links", "follow", "teleport")
+
+    def __init__(self, links, follow, teleport):
+        self.links = links
+        self.follow = follow
+        self.teleport = teleport
+
+    @classmethod
+    def build(cls, corpus, page, damping_factor):
+        """
+        Return the Transition from `page` of `corpus` with `damping_factor`.
+        """
+        links = corpus[page]
+        n = len(corpus)
+        if not links:
+            return cls((), 0.0, 1 / n)
+        return cls(tuple(links), 1 / len(links) * damping_factor, 1 / n * (1 - damping_factor))
+
+    def distribution(self, pages):
+        """
+        Return the model as a dictionary of every page in `pages` to the
+        probability of moving to it, linked pages first.
+        """
+        # Merging keeps each key where it was first inserted, so the links
+        # come first and then take back their own probability
+        linked = dict.fromkeys(self.links, self.follow + self.teleport)
+        return {**linked, **dict.fromkeys(pages, self.teleport), **linked}
+
+
+class TransitionCache():
+    """
+    Least-recently-used cache of the Transitions of `corpus`, keyed by
+    (page, damping factor) and holding at most `maxsize` of them, for
+    callers of transition_model that ask for the same pages repeatedly.
+
+    Each entry holds a page's links rather than a probability for every
+    page, so memory is bounded by `maxsize` times the most links a page
+    has, however large the corpus.
+    """
+
+    def __init__(self, corpus, maxsize=4096):
+        self.corpus = corpus
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, page, damping_factor):
+        """
+        Return the Transition from `page` with `damping_factor`.
+        """
+        key = (page, damping_factor)
+        try:
+            transition = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            transition = Transition.build(self.corpus, page, damping_factor)
+            self.entries[key] = transition
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+            return transition
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return transition
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }